@@ -0,0 +1,103 @@
+"""
+JWT authentication without a User query per request.
+
+CachedJWTAuthentication keeps resolved users in the cache for
+AUTH_USER_CACHE_TIMEOUT seconds; signals.py drops the entry whenever the
+user is saved or deleted (profile edits, deactivation, password changes).
+Only the column values are cached, without the password hash and the
+pending OTP; the user is rebuilt with those two deferred, so they are
+loaded from the database if a request reads them and left alone when it
+saves the user.
+
+ClaimsJWTAuthentication is for read-only endpoints that only need the id
+and university: it builds a ClaimsUser from the token itself (see
+tokens.UserRefreshToken) and touches neither the cache nor the database.
+Such a user is trusted for the access token's lifetime, so it must not be
+used where deactivation has to take effect immediately.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+UNIVERSITY_CLAIM = 'university_id'
+# never put in the cache
+UNCACHED_FIELDS = ('password', 'otp')
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(_key(user_id))
+
+
+def get_cached_user(user_id):
+    """
+    The user with this id, from the cache when possible; None if there is no such user.
+    """
+    from .models import User
+
+    names = [field.attname for field in User._meta.concrete_fields if field.attname not in UNCACHED_FIELDS]
+    cached = cache.get(_key(user_id))
+    if cached is None:
+        row = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*names, 'password').first()
+        if row is None:
+            return None
+        # the revoke claim carries the same digest, so it is no more secret than the token
+        revoke_hash = get_md5_hash_password(row[-1]) if api_settings.CHECK_REVOKE_TOKEN else None
+        cached = (row[:-1], revoke_hash)
+        cache.set(_key(user_id), cached, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+    values, revoke_hash = cached
+    user = User.from_db(router.db_for_read(User), names, values)
+    user._revoke_hash = revoke_hash
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user._revoke_hash:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user carrying the id and university_id from the token claims.
+    """
+
+    @cached_property
+    def university_id(self):
+        return self.token.get(UNIVERSITY_CLAIM)
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    def get_user(self, validated_token):
+        # tokens issued before the claim existed fall back to the cached user
+        if UNIVERSITY_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return ClaimsUser(validated_token)
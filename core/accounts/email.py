@@ -1,59 +1,38 @@
-from django.core.mail import send_mail
-from django.conf import settings
+import logging
+
+from django.db import transaction
+from outbox.mail import enqueue_email
 from .utils import generate_otp
 from .models import User
 
+logger = logging.getLogger(__name__)
 
 
-def send_otp_via_email(email):
-    subject = 'Your Email Verification OTP'
+def _store_and_enqueue_otp(email, subject, message_template):
     otp = generate_otp()
-    message = f'Your OTP for email verification is: {otp}'
-    email_from = settings.EMAIL_HOST_USER
-    
     try:
-        # Send email
-        send_mail(
-            subject,
-            message,
-            email_from,
-            [email],
-            fail_silently=False,
-        )
-        
-        # Update user's OTP in database
-        user = User.objects.get(email=email)
-        user.otp = otp
-        user.save()
-        
+        # the OTP and its email are written together; the outbox worker delivers it
+        with transaction.atomic():
+            user = User.objects.get(email=email)
+            user.otp = otp
+            user.save(update_fields=['otp'])
+            enqueue_email(subject, message_template.format(otp=otp), [email])
         return otp
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
+    except Exception:
+        logger.exception("Queueing email %r to %s failed", subject, email)
         return None
 
-def send_otp_via_email_forgot_password(email):
-    subject = 'Your Password Reset OTP'
-    otp = generate_otp()
-    message = f'Your OTP for password reset is: {otp}'
-    email_from = settings.EMAIL_HOST_USER
 
-    try:
-        # Send email
-        send_mail(
-            subject,
-            message,
-            email_from,
-            [email],
-            fail_silently=False,
-        )
-        
-        # Update user's OTP in database 
-        user = User.objects.get(email=email)
-        user.otp = otp
-        user.save()
-        
-        return otp
-    except Exception as e:  
-        print(f"Error sending email: {str(e)}")
-        return None
-    
\ No newline at end of file
+def send_otp_via_email(email):
+    return _store_and_enqueue_otp(
+        email,
+        'Your Email Verification OTP',
+        'Your OTP for email verification is: {otp}',
+    )
+
+def send_otp_via_email_forgot_password(email):
+    return _store_and_enqueue_otp(
+        email,
+        'Your Password Reset OTP',
+        'Your OTP for password reset is: {otp}',
+    )
@@ -0,0 +1,135 @@
+"""
+Google sign-in verification with cached keys and a pooled HTTP client.
+
+ID tokens are checked locally against Google's signing certificates, which
+are kept in the cache until their Cache-Control max-age runs out. A token
+naming an unknown key triggers an early refetch, at most once every
+GOOGLE_CERTS_REFRESH_INTERVAL seconds, so callers cannot turn every login
+request into a call to Google; a key that is still unknown is rejected. Access tokens are
+resolved through the userinfo endpoint and the result is cached for a few
+minutes under a hash of the token. Outbound calls share one keep-alive
+session with strict timeouts; the certificate and userinfo URLs come from
+settings, so a local stub server can stand in for Google.
+"""
+
+import hashlib
+import logging
+import re
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from google.auth import jwt
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CERTS_KEY = 'google:certs'
+CERTS_REFRESH_KEY = 'google:certs:refreshed'
+USERINFO_KEY = 'google:userinfo:'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+DEFAULT_CERTS_MAX_AGE = 3600
+
+_session = None
+
+
+class UnknownKeyError(ValueError):
+    pass
+
+
+def get_session():
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=getattr(settings, 'GOOGLE_HTTP_POOL_SIZE', 10), max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session = session
+    return _session
+
+
+def _timeout():
+    return getattr(settings, 'GOOGLE_HTTP_TIMEOUT', (3, 5))
+
+
+def _max_age(response):
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return int(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+
+
+def get_certs(refresh=False):
+    """
+    {key id: PEM certificate} used to sign Google ID tokens.
+    """
+    certs = None if refresh else cache.get(CERTS_KEY)
+    if certs is None:
+        response = get_session().get(settings.GOOGLE_OAUTH_CERTS_URL, timeout=_timeout())
+        response.raise_for_status()
+        certs = response.json()
+        cache.set(CERTS_KEY, certs, _max_age(response))
+    return certs
+
+
+def verify_id_token(token):
+    """
+    The claims of a valid Google ID token for our client; ValueError otherwise.
+    """
+    certs = get_certs()
+    key_id = jwt.decode_header(token).get('kid')
+    refresh_interval = getattr(settings, 'GOOGLE_CERTS_REFRESH_INTERVAL', 60)
+    if key_id not in certs and cache.add(CERTS_REFRESH_KEY, 1, refresh_interval):
+        # Google may have rotated its keys before our copy expired
+        certs = get_certs(refresh=True)
+    if key_id not in certs:
+        raise UnknownKeyError(f"Unknown signing key {key_id!r}")
+    claims = jwt.decode(
+        token,
+        certs=certs,
+        audience=settings.GOOGLE_OAUTH_CLIENT_ID,
+        clock_skew_in_seconds=getattr(settings, 'GOOGLE_CLOCK_SKEW_SECONDS', 10),
+    )
+    if claims.get('iss') not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer {claims.get('iss')!r}")
+    return claims
+
+
+def fetch_userinfo(access_token):
+    """
+    The userinfo of a Google access token, None if Google rejects it.
+    """
+    key = USERINFO_KEY + hashlib.sha256(access_token.encode()).hexdigest()
+    userinfo = cache.get(key)
+    if userinfo is None:
+        response = get_session().get(
+            settings.GOOGLE_OAUTH_USERINFO_URL,
+            headers={'Authorization': f'Bearer {access_token}'},
+            timeout=_timeout(),
+        )
+        if response.status_code != 200:
+            return None
+        userinfo = response.json()
+        cache.set(key, userinfo, getattr(settings, 'GOOGLE_USERINFO_CACHE_TIMEOUT', 300))
+    return userinfo
+
+
+def verify_google_token(token):
+    """
+    Google user claims for an ID token or an access token, None when neither is valid.
+    """
+    # only JWTs (header.payload.signature) can be ID tokens
+    if token.count('.') == 2:
+        try:
+            return verify_id_token(token)
+        except UnknownKeyError as e:
+            # signed, but not by a key Google is using
+            logger.info("Rejected Google ID token: %s", e)
+            return None
+        except ValueError:
+            pass
+        except requests.RequestException as e:
+            logger.warning("Fetching Google certificates failed: %s", e)
+    try:
+        return fetch_userinfo(token)
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Google user info fetch failed: %s", e)
+        return None
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+MODELS = (OutstandingToken, BlacklistedToken)
+
+
+def table_sizes():
+    """
+    {table: (rows, bytes)}; exact row counts, on-disk size on PostgreSQL only.
+    """
+    sizes = {}
+    for model in MODELS:
+        table = model._meta.db_table
+        size = None
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+                size = cursor.fetchone()[0]
+        sizes[table] = (model.objects.count(), size)
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding refresh tokens and their blacklist entries in small batches, "
+        "each in its own short transaction. Run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help="Seconds to pause between batches.")
+
+    def report(self, label, sizes):
+        for table, (rows, size) in sizes.items():
+            size = f", {size / 1024 / 1024:.1f} MiB" if size is not None else ""
+            self.stdout.write(f"{label} {table}: {rows} rows{size}")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.report("Before", table_sizes())
+
+        now = timezone.now()
+        started = time.monotonic()
+        outstanding = blacklisted = 0
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lt=now)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                # blacklist rows first so the outstanding delete finds nothing to cascade
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+                outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - started
+        rate = (outstanding + blacklisted) / elapsed if elapsed else 0
+        self.report("After", table_sizes())
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {outstanding} outstanding and {blacklisted} blacklisted tokens "
+            f"in {elapsed:.2f}s ({rate:.0f} rows/s)."
+        ))
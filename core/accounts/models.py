@@ -3,6 +3,8 @@ from django.db import models
 from .manager import UserManager
 from django.apps import apps
 from cloudinary.models import CloudinaryField
+from core.image_variants import AVATAR_VARIANTS, refresh_image_variants
+from core.response_cache import bump_versions_on_commit
 
 from uuid import uuid4
 
@@ -17,6 +19,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=255, null=True, blank=True)
     username = models.CharField(max_length=255, unique=True, db_index=True)
     profile_picture = CloudinaryField('image', blank=True, null=True)
+    # resized delivery URLs of profile_picture, built on save (core.image_variants)
+    avatar_url = models.URLField(max_length=500, null=True, blank=True, editable=False)
+    avatar_webp_url = models.URLField(max_length=500, null=True, blank=True, editable=False)
     is_email_verified = models.BooleanField(default=False, db_index=True)
     phone_number = models.CharField(max_length=20, null=True, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
@@ -34,6 +39,25 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous_avatar = None if 'avatar_url' in self.get_deferred_fields() else self.avatar_url
+        update_fields = refresh_image_variants(self, 'profile_picture', AVATAR_VARIANTS, kwargs.get('update_fields'))
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if not adding and self.avatar_url != previous_avatar:
+            self.drop_cached_author_images()
+
+    def drop_cached_author_images(self):
+        """
+        The avatar is rendered into cached contribution responses; bump their scopes once committed.
+        """
+        from contributions.models import Contributions
+
+        contribution_ids = Contributions.objects.filter(user_id=self.pk).values_list('pk', flat=True)
+        bump_versions_on_commit('contributions', *(f'contribution:{pk}' for pk in contribution_ids))
+
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
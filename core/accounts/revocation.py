@@ -0,0 +1,58 @@
+"""
+Shared revocation filter for refresh tokens.
+
+The revoked state is cached until the token expires. Every BlacklistedToken
+row, whether created by UserRefreshToken.blacklist() or through the admin,
+marks its jti revoked once it commits (see signals.py), and deleting the row
+clears the mark.
+
+On a shared cache (Redis) a live token is cached too, for at most
+TOKEN_REVOCATION_LIVE_TTL seconds, so most refresh checks skip the
+database; the revocation mark overwrites that entry on every worker at
+once. A per-process cache would only hear about logouts of its own
+process, so there a token not known to be revoked is looked up every time.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+REVOKED = 'revoked'
+LIVE = 'live'
+SHARED_BACKENDS = ('django.core.cache.backends.redis.RedisCache', 'django_redis.cache.RedisCache')
+
+
+def _key(jti):
+    return f'jwt:revocation:{jti}'
+
+
+def _seconds_left(exp):
+    return max(int((datetime_from_epoch(exp) - timezone.now()).total_seconds()), 1)
+
+
+def _cache_is_shared():
+    return settings.CACHES['default'].get('BACKEND') in SHARED_BACKENDS
+
+
+def is_revoked(jti, exp):
+    state = cache.get(_key(jti))
+    if state is not None:
+        return state == REVOKED
+    if BlacklistedToken.objects.filter(token__jti=jti).exists():
+        mark_revoked(jti, exp)
+        return True
+    if _cache_is_shared():
+        # add(), not set(): a revocation stored since the lookup must win
+        live_ttl = getattr(settings, 'TOKEN_REVOCATION_LIVE_TTL', 300)
+        cache.add(_key(jti), LIVE, min(_seconds_left(exp), live_ttl))
+    return False
+
+
+def mark_revoked(jti, exp):
+    cache.set(_key(jti), REVOKED, _seconds_left(exp))
+
+
+def clear_revoked(jti):
+    cache.delete(_key(jti))
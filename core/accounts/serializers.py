@@ -1,6 +1,7 @@
 
 
 from .models import User
+from .utils import save_with_unique_username
 from university.models import University
 from rest_framework import serializers
 
@@ -24,20 +25,11 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ('first_name', 'last_name', 'email', 'password', 'profile_picture', 'phone_number', 'date_of_birth', 'university')
 
     def create(self, validated_data):
-        import random
         first_name = validated_data.get('first_name', '')
         last_name = validated_data.get('last_name', '')
-        # Generate a random 2-digit integer
-        rand_int = random.randint(10, 99)
-        base_username = f"{first_name.lower()}_{str(rand_int)}"
-        # Ensure username is unique so add 4 digits
-        while User.objects.filter(username=base_username).exists():
-            rand_int = random.randint(1000, 9999)
-            base_username = f"{first_name.lower()}_{str(rand_int)}"
         user = User(
             first_name=first_name,
             last_name=last_name,
-            username=base_username,
             email=validated_data['email'],
             profile_picture=validated_data.get('profile_picture'),
             phone_number=validated_data.get('phone_number'),
@@ -45,5 +37,5 @@ class RegisterSerializer(serializers.ModelSerializer):
             university=validated_data.get('university')
         )
         user.set_password(validated_data['password'])
-        user.save()
-        return user
+        # username format: {first_name}_{random digits}
+        return save_with_unique_username(user, first_name)
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_cached_user
+from .models import User
+from .revocation import clear_revoked, mark_revoked
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, **kwargs):
+    # also covers tokens blacklisted through the admin
+    token = instance.token
+    transaction.on_commit(lambda: mark_revoked(token.jti, int(token.expires_at.timestamp())))
+
+
+@receiver(post_delete, sender=BlacklistedToken)
+def token_unblacklisted(sender, instance, **kwargs):
+    jti = instance.token.jti
+    transaction.on_commit(lambda: clear_revoked(jti))
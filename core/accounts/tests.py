@@ -1,3 +1,338 @@
-from django.test import TestCase
+import json
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from google.auth import crypt, jwt
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from outbox.mail import deliver_batch
+from outbox.models import EmailOutbox
+from . import google, revocation, utils
+from .authentication import CachedJWTAuthentication, _key as cached_user_key, get_cached_user
+from .email import send_otp_via_email
+from .models import User
+from .revocation import is_revoked
+from .tokens import UserRefreshToken
+from .utils import allocate_username, save_with_unique_username, username_base
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    x509 = None
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+CLIENT_ID = 'test-client.apps.googleusercontent.com'
+
+
+class RevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='student', email='student@example.com')
+        self.token = UserRefreshToken.for_user(self.user)
+        self.jti, self.exp = self.token['jti'], self.token['exp']
+
+    def blacklist(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.blacklist()
+
+    def test_live_tokens_are_cached_on_a_shared_cache(self):
+        with mock.patch.object(revocation, 'SHARED_BACKENDS', (LOCMEM,)):
+            with self.assertNumQueries(1):
+                self.assertFalse(is_revoked(self.jti, self.exp))
+            with self.assertNumQueries(0):
+                self.assertFalse(is_revoked(self.jti, self.exp))
+
+            # the revocation replaces the cached live state
+            self.blacklist()
+            with self.assertNumQueries(0):
+                self.assertTrue(is_revoked(self.jti, self.exp))
+
+    def test_live_tokens_are_looked_up_on_a_process_cache(self):
+        # another process's logout would never reach this cache
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.assertFalse(is_revoked(self.jti, self.exp))
+
+    def test_blacklisted_tokens_are_refused_from_the_cache(self):
+        self.blacklist()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(is_revoked(self.jti, self.exp))
+        with self.assertRaises(TokenError):
+            UserRefreshToken(str(self.token))
+
+    def test_revocation_seen_without_the_cache(self):
+        # blacklisted by another worker whose cache entry we do not share
+        self.blacklist()
+        cache.clear()
+
+        self.assertTrue(is_revoked(self.jti, self.exp))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_revoked(self.jti, self.exp))
+
+    def test_removing_the_blacklist_row_restores_the_token(self):
+        self.blacklist()
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.filter(token__jti=self.jti).delete()
+
+        self.assertFalse(is_revoked(self.jti, self.exp))
+        UserRefreshToken(str(self.token))
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='student', email='student@example.com', otp='123456')
+        self.user.set_password('secret-password')
+        self.user.save()
+        self.token = UserRefreshToken.for_user(self.user).access_token
+        self.authentication = CachedJWTAuthentication()
+        # issuing the access token cached the user
+        cache.clear()
+
+    def test_users_are_resolved_from_the_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authentication.get_user(self.token).pk, self.user.pk)
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(self.token)
+        self.assertEqual((user.username, user.email, user.is_active), ('student', 'student@example.com', True))
+
+    def test_secrets_stay_out_of_the_cache(self):
+        user = get_cached_user(self.user.pk)
+
+        cached = repr(cache.get(cached_user_key(self.user.pk)))
+        self.assertNotIn(self.user.password, cached)
+        self.assertNotIn('123456', cached)
+        self.assertEqual(user.get_deferred_fields(), {'password', 'otp'})
+        # read on demand
+        self.assertTrue(user.check_password('secret-password'))
+
+    def test_saving_a_cached_user_keeps_the_secrets(self):
+        user = get_cached_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(otp='654321')
+
+        user.first_name = 'Ada'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(User.objects.values_list('first_name', 'otp').get(pk=self.user.pk), ('Ada', '654321'))
+
+    def test_deactivation_takes_effect_at_once(self):
+        self.authentication.get_user(self.token)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+
+class UsernameAllocationTests(TestCase):
+    def test_base_keeps_word_characters(self):
+        self.assertEqual(username_base('Ada Lovelace!'), 'adalovelace')
+        self.assertEqual(username_base(' !! '), 'user')
+        self.assertEqual(username_base(None), 'user')
+
+    def test_common_names_cost_one_lookup(self):
+        User.objects.bulk_create([
+            User(username=f'ada_{n}', email=f'ada{n}@example.com') for n in range(10, 100)
+        ])
+
+        with self.assertNumQueries(1):
+            username = allocate_username('Ada')
+        # every two-digit suffix is taken, so a four-digit one is used
+        self.assertRegex(username, r'^ada_\d{4}$')
+
+    def test_fallback_when_every_candidate_is_taken(self):
+        User.objects.create(username='ada_10', email='ada@example.com')
+
+        with mock.patch.object(utils, '_candidates', return_value=['ada_10']), self.assertNumQueries(2):
+            username = allocate_username('Ada')
+        self.assertRegex(username, r'^ada_[0-9a-f]{12}$')
+
+    def test_lost_race_is_retried(self):
+        User.objects.create(username='ada_10', email='first@example.com')
+
+        with mock.patch.object(utils, 'allocate_username', side_effect=['ada_10', 'ada_11']):
+            user = save_with_unique_username(User(email='second@example.com'), 'Ada')
+        self.assertEqual(User.objects.get(pk=user.pk).username, 'ada_11')
+
+    def test_other_conflicts_are_not_retried(self):
+        User.objects.create(username='ada_10', email='ada@example.com')
+
+        with mock.patch.object(utils, 'allocate_username', side_effect=['ada_11', 'ada_12']) as allocate:
+            with self.assertRaises(IntegrityError):
+                save_with_unique_username(User(email='ada@example.com'), 'Ada')
+        self.assertEqual(allocate.call_count, 1)
+
+
+class OtpEmailTests(TestCase):
+    """
+    OTP emails go through the outbox; the test runner's locmem backend collects what is sent.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='student', email='student@example.com')
+
+    def test_otp_is_stored_and_delivered_by_the_worker(self):
+        otp = send_otp_via_email(self.user.email)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.otp, otp)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.PENDING).count(), 1)
+
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertIn(otp, mail.outbox[0].body)
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENT)
+
+    def test_unknown_address_queues_nothing(self):
+        with self.assertLogs('accounts.email', 'ERROR'):
+            self.assertIsNone(send_otp_via_email('nobody@example.com'))
+        self.assertFalse(EmailOutbox.objects.exists())
+
+
+class StubGoogle(BaseHTTPRequestHandler):
+    """
+    Serves the certificate and userinfo endpoints; the test sets `certs` and `userinfo`.
+    """
+    certs = {}
+    userinfo = {}
+    hits = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        if self.path == '/certs':
+            self.reply(200, self.certs, {'Cache-Control': 'public, max-age=600'})
+        elif self.path == '/userinfo' and self.headers.get('Authorization') == 'Bearer good-access-token':
+            self.reply(200, self.userinfo)
+        else:
+            self.reply(401, {'error': 'invalid_token'})
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_signing_key(key_id):
+    """
+    (signer, PEM certificate) of a fresh self-signed RSA key.
+    """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'stub-google')])
+    now = datetime.now(dt_timezone.utc)
+    certificate = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number()).not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1)).sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+    return signer, certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class GoogleVerificationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGoogle)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.settings_override = override_settings(
+            GOOGLE_OAUTH_CLIENT_ID=CLIENT_ID,
+            GOOGLE_OAUTH_CERTS_URL=f'{base}/certs',
+            GOOGLE_OAUTH_USERINFO_URL=f'{base}/userinfo',
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        StubGoogle.hits.clear()
+        StubGoogle.userinfo = {'sub': '42', 'email': 'student@example.com', 'name': 'Student'}
+
+    def id_token(self, signer, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': CLIENT_ID, 'sub': '42',
+            'email': 'student@example.com', 'iat': now, 'exp': now + 600, **claims,
+        }
+        return jwt.encode(signer, payload).decode()
+
+    def test_access_token_userinfo_is_cached(self):
+        for _ in range(2):
+            self.assertEqual(google.verify_google_token('good-access-token')['email'], 'student@example.com')
+        self.assertEqual(StubGoogle.hits, ['/userinfo'])
+
+    def test_rejected_access_token(self):
+        self.assertIsNone(google.verify_google_token('revoked-access-token'))
+
+    @unittest.skipUnless(x509, "needs cryptography to sign test ID tokens")
+    def test_id_tokens_are_verified_locally_with_cached_certs(self):
+        signer, certificate = make_signing_key('key-1')
+        StubGoogle.certs = {'key-1': certificate}
+
+        for _ in range(2):
+            self.assertEqual(google.verify_google_token(self.id_token(signer))['sub'], '42')
+        self.assertEqual(StubGoogle.hits, ['/certs'])
+
+    @unittest.skipUnless(x509, "needs cryptography to sign test ID tokens")
+    def test_unknown_key_refetches_certs(self):
+        old_signer, old_certificate = make_signing_key('key-1')
+        StubGoogle.certs = {'key-1': old_certificate}
+        google.get_certs()
+
+        new_signer, new_certificate = make_signing_key('key-2')
+        StubGoogle.certs = {'key-2': new_certificate}
+        self.assertEqual(google.verify_google_token(self.id_token(new_signer))['sub'], '42')
+        self.assertEqual(StubGoogle.hits, ['/certs', '/certs'])
+
+    @unittest.skipUnless(x509, "needs cryptography to sign test ID tokens")
+    def test_id_token_for_another_client_is_refused(self):
+        signer, certificate = make_signing_key('key-1')
+        StubGoogle.certs = {'key-1': certificate}
+
+        # not a valid ID token, and Google's userinfo endpoint does not know it either
+        self.assertIsNone(google.verify_google_token(self.id_token(signer, aud='someone-else')))
+
+    @unittest.skipUnless(x509, "needs cryptography to sign test ID tokens")
+    def test_unknown_keys_refetch_at_most_once_per_interval(self):
+        _signer, certificate = make_signing_key('key-1')
+        StubGoogle.certs = {'key-1': certificate}
+        google.get_certs()
+        stranger, _certificate = make_signing_key('key-9')
+
+        for _ in range(3):
+            self.assertIsNone(google.verify_google_token(self.id_token(stranger)))
+        # one early refetch, and no userinfo call for a token signed by an unknown key
+        self.assertEqual(StubGoogle.hits, ['/certs', '/certs'])
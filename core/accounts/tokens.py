@@ -0,0 +1,55 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .authentication import UNIVERSITY_CLAIM, get_cached_user
+from .revocation import is_revoked
+
+
+def _university_claim(university_id):
+    return str(university_id) if university_id else None
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens carry the user's university_id,
+    which ClaimsJWTAuthentication reads instead of loading the user.
+    Blacklist checks go through the revocation filter (revocation.py).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[UNIVERSITY_CLAIM] = _university_claim(user.university_id)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        # the university may have changed since the refresh token was issued
+        user = get_cached_user(self[api_settings.USER_ID_CLAIM])
+        if user is not None:
+            access[UNIVERSITY_CLAIM] = _university_claim(user.university_id)
+        return access
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload['exp']
+        token, _created = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                "user": get_cached_user(self.payload.get(api_settings.USER_ID_CLAIM)),
+                "created_at": self.current_time,
+                "token": str(self),
+                "expires_at": datetime_from_epoch(exp),
+            },
+        )
+        # the BlacklistedToken signal marks the jti revoked once this commits
+        return BlacklistedToken.objects.get_or_create(token=token)
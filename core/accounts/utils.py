@@ -1,5 +1,8 @@
+import re
 import secrets
 
+from django.db import IntegrityError, transaction
+
 def generate_otp():
     """
     Generate a cryptographically secure 4-digit OTP using secrets module.
@@ -8,4 +11,62 @@ def generate_otp():
     """
     # Generate a secure random number between 1000 and 9999
     # Using direct bit operations for better performance with large user bases
-    return str(1000 + (secrets.randbits(14) % 9000)) 
\ No newline at end of file
+    return str(1000 + (secrets.randbits(14) % 9000)) 
+
+
+# suffix widths, checked two per round; each round is one `username IN (...)` lookup
+USERNAME_SUFFIX_DIGITS = (2, 4, 6, 8)
+USERNAME_CANDIDATES_PER_WIDTH = 8
+USERNAME_INSERT_ATTEMPTS = 3
+
+
+def username_base(first_name):
+    base = re.sub(r'[^\w.]+', '', (first_name or '').lower())[:200]
+    return base or 'user'
+
+
+def _candidates(base, digits):
+    low = 10 ** (digits - 1)
+    return [f"{base}_{low + secrets.randbelow(9 * low)}" for _ in range(USERNAME_CANDIDATES_PER_WIDTH)]
+
+
+def allocate_username(first_name):
+    """
+    A free `{first_name}_{digits}` username.
+
+    Random candidates of a few widths are checked against the unique index in
+    one query per round, shortest suffix first, so the cost is bounded
+    (two queries for the suffix widths above) even for very common names.
+    """
+    from .models import User
+
+    base = username_base(first_name)
+    for first in range(0, len(USERNAME_SUFFIX_DIGITS), 2):
+        widths = USERNAME_SUFFIX_DIGITS[first:first + 2]
+        candidates = [name for digits in widths for name in _candidates(base, digits)]
+        taken = set(User.objects.filter(username__in=candidates).values_list('username', flat=True))
+        for name in candidates:
+            if name not in taken:
+                return name
+    # 32 random candidates all taken: fall back to a suffix that cannot collide in practice
+    return f"{base}_{secrets.token_hex(6)}"
+
+
+def save_with_unique_username(user, first_name):
+    """
+    Insert a new user under an allocated username, retrying when a concurrent
+    registration takes the same name between the lookup and the insert.
+    """
+    from .models import User
+
+    for attempt in range(USERNAME_INSERT_ATTEMPTS):
+        user.username = allocate_username(first_name)
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+            return user
+        except IntegrityError:
+            # only a username race is retried; other conflicts (e.g. email) are the caller's
+            if attempt == USERNAME_INSERT_ATTEMPTS - 1 or not User.objects.filter(username=user.username).exists():
+                raise
+    return user
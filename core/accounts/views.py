@@ -6,6 +6,8 @@ from rest_framework import status, permissions
 from .serializers import RegisterSerializer,UserProfileSerializer
 from .models import User
 from .email import send_otp_via_email
+from .tokens import UserRefreshToken
+from .utils import save_with_unique_username
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 
 
@@ -46,7 +48,7 @@ class VerifyOtpView(APIView):
 
         try:
             user = User.objects.get(email=email)
-            refresh = RefreshToken.for_user(user)
+            refresh = UserRefreshToken.for_user(user)
             access = AccessToken.for_user(user)
 
             if user.otp == otp:
@@ -54,7 +56,7 @@ class VerifyOtpView(APIView):
                 user.otp = None  # Clear OTP after successful verification
                 user.save()
 
-                refresh = RefreshToken.for_user(user)
+                refresh = UserRefreshToken.for_user(user)
                 access = refresh.access_token
                 return Response({
                     "message": "Email verified successfully.",
@@ -98,7 +100,7 @@ class LoginView(APIView):
             if user is None:
                 return Response({"error": "User with this username or email does not exist."}, status=status.HTTP_404_NOT_FOUND)
             if user.check_password(password) and user.is_email_verified:
-                refresh = RefreshToken.for_user(user)
+                refresh = UserRefreshToken.for_user(user)
                 access = refresh.access_token
                 return Response({
                     "message": "Login successful.",
@@ -123,8 +125,7 @@ class LogoutView(APIView):
         if not refresh_token:
             return Response({"error": "Refresh token required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            from rest_framework_simplejwt.tokens import RefreshToken as JWTRefreshToken
-            token = JWTRefreshToken(refresh_token)
+            token = UserRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Logout successful."}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
@@ -141,8 +142,7 @@ class CircleRefreshToken(APIView):
         if not refresh_token:
             return Response({"error": "Refresh token required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            from rest_framework_simplejwt.tokens import RefreshToken as JWTRefreshToken
-            token = JWTRefreshToken(refresh_token)
+            token = UserRefreshToken(refresh_token)
             access_token = str(token.access_token)
             return Response({"access": access_token}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -186,13 +186,10 @@ class UserProfile(APIView):
 # dirrect social login with Google
 # ===============================
 
-from google.oauth2 import id_token
-from google.auth.transport import requests
-import requests as http_requests
+from .google import verify_google_token
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
-import random
 
 User = get_user_model()
 
@@ -205,23 +202,8 @@ class GoogleLoginView(APIView):
         if not token:
             return Response({"error": "Token is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        google_user = None
-        try:
-            # Try as ID Token
-            google_user = id_token.verify_oauth2_token(
-                token,
-                requests.Request(),
-                settings.GOOGLE_OAUTH_CLIENT_ID
-            )
-        except ValueError:
-            # Try as Access Token
-            try:
-                resp = http_requests.get("https://www.googleapis.com/oauth2/v3/userinfo", params={"access_token": token})
-                if resp.status_code == 200:
-                    google_user = resp.json()
-            except Exception as e:
-                print(f"Google user info fetch failed: {e}")
-                pass
+        # ID token verified locally against cached keys, else resolved as an access token
+        google_user = verify_google_token(token)
 
         if not google_user:
              return Response({"error": "Invalid Google token"}, status=status.HTTP_400_BAD_REQUEST)
@@ -244,21 +226,15 @@ class GoogleLoginView(APIView):
             last_name = " ".join(name.split(" ")[1:]) if name else ""
             
             # Generate username using the same logic as manual registration
-            # Format: {first_name}_{random_2_digits}
-            rand_int = random.randint(10, 99)
-            base_username = f"{first_name.lower()}_{str(rand_int)}"
-            
-            # Ensure username is unique, if not add 4 digits
-            while User.objects.filter(username=base_username).exists():
-                rand_int = random.randint(1000, 9999)
-                base_username = f"{first_name.lower()}_{str(rand_int)}"
-            
-            user = User.objects.create(
-                email=email,
-                username=base_username,
-                first_name=first_name,
-                last_name=last_name,
-                is_email_verified=True,
+            # Format: {first_name}_{random digits}
+            user = save_with_unique_username(
+                User(
+                    email=email,
+                    first_name=first_name,
+                    last_name=last_name,
+                    is_email_verified=True,
+                ),
+                first_name,
             )
             created = True
 
@@ -267,7 +243,7 @@ class GoogleLoginView(APIView):
         # For now, we just pass the picture URL in the response
         
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
         access = refresh.access_token
 
         return Response({
@@ -1,5 +1,4 @@
-from django.core.mail import send_mail
-from django.conf import settings
+from outbox.mail import enqueue_email
 
 def send_contact_email(name, email, subject, message):
     email_subject = f"CG-Lagbe Contact Message: {subject}"
@@ -14,10 +13,9 @@ def send_contact_email(name, email, subject, message):
     {message}
     """
     
-    send_mail(
+    # delivered by the outbox worker (manage.py send_queued_emails)
+    enqueue_email(
         email_subject,
         email_body,
-        settings.EMAIL_HOST_USER,
         ['hi@reshad.dev'],
-        fail_silently=False,
     )
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+def create_postgres_extensions(sender, using='default', **kwargs):
+    """
+    The trigram indexes on contributions need pg_trgm before the tables are migrated.
+    """
+    from django.db import connections
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
 
 
 class ContributionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contributions'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        pre_migrate.connect(create_postgres_extensions, sender=self)
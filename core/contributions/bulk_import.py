@@ -0,0 +1,220 @@
+"""
+Bulk import of contributions with their videos and notes.
+
+A manifest is either JSON, a list of
+
+    {"ref": "...", "title": ..., "course_code": ..., "description": ...,
+     "price": ..., "active": ..., "related_University": <uuid>, "department": <uuid>,
+     "videos": [{"title": ..., "video_file": <url>}], "notes": [{"title": ..., "note_file": <url>}]}
+
+(optionally wrapped in {"contributions": [...]}), or CSV with one row per
+item and the columns
+
+    ref, kind, title, description, course_code, price, active,
+    related_University, department, file
+
+where `kind` is "contribution", "video" or "note" and video/note rows
+attach to the contribution row with the same `ref`.
+
+The whole manifest is validated in one pass (universities and departments
+are looked up once for all rows). Every valid contribution is then inserted
+in its own transaction, its videos and notes with bulk_create, and one
+result per contribution is yielded as soon as it is settled.
+"""
+
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.response_cache import bump_versions_on_commit
+from university.models import Department, University
+from .models import Contributions, ContributionVideos, ContributionNotes
+
+CSV_KINDS = ('contribution', 'video', 'note')
+
+
+class ManifestError(ValueError):
+    pass
+
+
+class ImportVideoSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    video_file = serializers.URLField(max_length=500)
+
+
+class ImportNoteSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    note_file = serializers.URLField(max_length=500)
+
+
+class ImportContributionSerializer(serializers.Serializer):
+    """
+    Row validation without database access; foreign keys are checked against
+    the ids fetched once per manifest (see validate_manifest).
+    """
+    ref = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    course_code = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, default=0)
+    active = serializers.BooleanField(required=False, default=True)
+    related_University = serializers.UUIDField(required=False, allow_null=True)
+    department = serializers.UUIDField(required=False, allow_null=True)
+    videos = ImportVideoSerializer(many=True, required=False, default=list)
+    notes = ImportNoteSerializer(many=True, required=False, default=list)
+
+
+def _blank_to_none(row):
+    return {key: (value if value != '' else None) for key, value in row.items() if key}
+
+
+def parse_csv(text):
+    entries = {}
+    order = []
+    for line, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        row = _blank_to_none({(key or '').strip(): value for key, value in row.items()})
+        kind = (row.pop('kind', None) or 'contribution').lower()
+        ref = row.get('ref') or f'line-{line}'
+        if kind not in CSV_KINDS:
+            raise ManifestError(f"line {line}: unknown kind {kind!r}")
+        if ref not in entries:
+            entries[ref] = {'ref': ref, 'videos': [], 'notes': []}
+            order.append(ref)
+        entry = entries[ref]
+        file_url = row.pop('file', None)
+        if kind == 'contribution':
+            entry.update({key: value for key, value in row.items() if value is not None})
+        elif kind == 'video':
+            entry['videos'].append({'title': row.get('title'), 'video_file': file_url})
+        else:
+            entry['notes'].append({'title': row.get('title'), 'note_file': file_url})
+    return [entries[ref] for ref in order]
+
+
+def parse_manifest(content, fmt=None):
+    """
+    The manifest (bytes or str) as a list of contribution dicts. fmt is "json" or "csv"; guessed when omitted.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if fmt is None:
+        fmt = 'json' if content.lstrip()[:1] in ('[', '{') else 'csv'
+    if fmt == 'csv':
+        entries = parse_csv(content)
+    else:
+        try:
+            entries = json.loads(content)
+        except ValueError as e:
+            raise ManifestError(f"Invalid JSON: {e}")
+        if isinstance(entries, dict):
+            entries = entries.get('contributions')
+        if not isinstance(entries, list):
+            raise ManifestError("Expected a list of contributions.")
+    return check_manifest_size(entries)
+
+
+def check_manifest_size(entries):
+    max_rows = getattr(settings, 'BULK_IMPORT_MAX_CONTRIBUTIONS', 1000)
+    if len(entries) > max_rows:
+        raise ManifestError(f"A manifest may hold at most {max_rows} contributions.")
+    return entries
+
+
+def validate_manifest(entries):
+    """
+    [(index, ref, validated data or None, errors or None)] for all rows, in two queries.
+    """
+    rows = []
+    university_ids, department_ids = set(), set()
+    for index, entry in enumerate(entries):
+        ref = entry.get('ref') if isinstance(entry, dict) else None
+        row = ImportContributionSerializer(data=entry)
+        if row.is_valid():
+            data = row.validated_data
+            university_ids.add(data.get('related_University'))
+            department_ids.add(data.get('department'))
+            rows.append((index, ref, data, None))
+        else:
+            rows.append((index, ref, None, row.errors))
+
+    universities = set(University.objects.filter(pk__in=university_ids - {None}).values_list('pk', flat=True))
+    departments = set(Department.objects.filter(pk__in=department_ids - {None}).values_list('pk', flat=True))
+
+    checked = []
+    for index, ref, data, errors in rows:
+        if data is not None:
+            errors = {}
+            if data.get('related_University') and data['related_University'] not in universities:
+                errors['related_University'] = ["University not found."]
+            if data.get('department') and data['department'] not in departments:
+                errors['department'] = ["Department not found."]
+            if errors:
+                data = None
+        checked.append((index, ref, data, errors or None))
+    return checked
+
+
+def import_contribution(user, data, batch_size=500):
+    """
+    Insert one contribution with its videos and notes in one transaction.
+    """
+    data = dict(data)
+    videos = data.pop('videos', [])
+    notes = data.pop('notes', [])
+    data.pop('ref', None)
+    university_id = data.pop('related_University', None)
+    department_id = data.pop('department', None)
+
+    with transaction.atomic():
+        contribution = Contributions(
+            user=user,
+            related_University_id=university_id,
+            department_id=department_id,
+            **data,
+        )
+        contribution.save()
+        ContributionVideos.objects.bulk_create(
+            [ContributionVideos(contribution=contribution, **video) for video in videos],
+            batch_size=batch_size,
+        )
+        ContributionNotes.objects.bulk_create(
+            [ContributionNotes(contribution=contribution, **note) for note in notes],
+            batch_size=batch_size,
+        )
+        # bulk_create sends no signals; drop cached responses for the new content ourselves
+        bump_versions_on_commit('contributions', f'contribution:{contribution.pk}')
+    return contribution, len(videos), len(notes)
+
+
+def run_import(user, entries):
+    """
+    Validate the manifest, then import it, yielding one result dict per contribution and a final summary.
+    """
+    summary = {'created': 0, 'invalid': 0, 'failed': 0, 'videos': 0, 'notes': 0}
+    for index, ref, data, errors in validate_manifest(entries):
+        result = {'row': index, 'ref': ref}
+        if data is None:
+            summary['invalid'] += 1
+            yield {**result, 'status': 'invalid', 'errors': errors}
+            continue
+        try:
+            contribution, videos, notes = import_contribution(user, data)
+        except Exception as e:
+            summary['failed'] += 1
+            yield {**result, 'status': 'failed', 'errors': {'non_field_errors': [str(e)]}}
+            continue
+        summary['created'] += 1
+        summary['videos'] += videos
+        summary['notes'] += notes
+        yield {**result, 'status': 'created', 'id': contribution.pk, 'videos': videos, 'notes': notes}
+    yield {'summary': summary}
+
+
+def ndjson_lines(results):
+    for result in results:
+        yield json.dumps(result, cls=JSONEncoder) + '\n'
@@ -0,0 +1,87 @@
+"""
+Per-contribution engagement counters (comment_count, enrollment_count).
+
+Signals keep them current with F() updates (contributions/signals.py,
+enrollment/signals.py); rating_count belongs to the rating aggregates in
+ratings.py. reconcile_counters() recomputes a batch from the source tables
+to backfill new columns and repair drift.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F
+
+
+def counter_sources():
+    """
+    {counter field: (model, foreign key to the contribution)}.
+    """
+    from enrollment.models import Enrollement
+    from .models import ContributionsComments
+
+    return {
+        'comment_count': (ContributionsComments, 'contribution_id'),
+        'enrollment_count': (Enrollement, 'contribution_id'),
+    }
+
+
+def bump_counter(contribution_id, field, delta):
+    """
+    Atomic `field = field + delta`; never drops below zero.
+    """
+    from .models import Contributions
+
+    if not contribution_id or not delta:
+        return
+    queryset = Contributions.objects.filter(pk=contribution_id)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def deleted_with_contribution(origin):
+    """
+    Whether a post_delete signal comes from deleting the contribution itself
+    (its rows cascade away, so there is no counter left to update).
+    """
+    from .models import Contributions
+
+    return isinstance(origin, Contributions) or getattr(origin, 'model', None) is Contributions
+
+
+def compute_counters(contribution_ids):
+    counters = {pk: {} for pk in contribution_ids}
+    for field, (model, fk) in counter_sources().items():
+        for values in counters.values():
+            values[field] = 0
+        rows = (
+            model.objects.filter(**{f'{fk}__in': contribution_ids}).order_by()
+            .values(fk).annotate(count=Count('pk'))
+        )
+        for row in rows:
+            counters[row[fk]][field] = row['count']
+    return counters
+
+
+def reconcile_counters(contribution_ids):
+    """
+    Rewrite the counters of a batch of contributions. Only the batch rows are
+    locked, for the duration of this call; concurrent F() updates wait and then
+    apply on top of the repaired values.
+    Returns the number of rows that had drifted.
+    """
+    from .models import Contributions
+
+    fields = list(counter_sources())
+    with transaction.atomic():
+        contributions = list(Contributions.objects.select_for_update().filter(pk__in=contribution_ids).only(*fields))
+        counters = compute_counters([c.pk for c in contributions])
+        drifted = []
+        for contribution in contributions:
+            values = counters[contribution.pk]
+            if any(getattr(contribution, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(contribution, field, value)
+                drifted.append(contribution)
+        if drifted:
+            Contributions.objects.bulk_update(drifted, fields)
+    return len(drifted)
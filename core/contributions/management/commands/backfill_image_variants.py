@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from contributions.models import Contributions
+from core.image_variants import AVATAR_VARIANTS, THUMBNAIL_VARIANTS, variant_urls
+from core.response_cache import bump_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the stored Cloudinary variant URLs of contribution thumbnails and profile pictures "
+        "in pk-ordered batches. URLs are built locally, nothing is uploaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help="Rebuild every row, e.g. after changing the variants.")
+
+    def backfill(self, model, image_field, variants, batch_size, rebuild):
+        queryset = model.objects.exclude(Q(**{f'{image_field}__isnull': True}) | Q(**{image_field: ''})).order_by('pk')
+        if not rebuild:
+            missing = Q()
+            for column in variants:
+                missing |= Q(**{f'{column}__isnull': True})
+            queryset = queryset.filter(missing)
+        queryset = queryset.only('pk', image_field)
+
+        updated = 0
+        last_pk = None
+        while True:
+            batch = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:batch_size])
+            if not batch:
+                break
+            for row in batch:
+                for column, url in variant_urls(getattr(row, image_field), variants).items():
+                    setattr(row, column, url)
+            # bulk_update skips save(), which would narrow the write and rebuild the search vector
+            model.objects.bulk_update(batch, list(variants))
+            updated += len(batch)
+            last_pk = batch[-1].pk
+        return updated
+
+    def handle(self, *args, **options):
+        batch_size, rebuild = options['batch_size'], options['all']
+        contributions = self.backfill(Contributions, 'thumbnail_image', THUMBNAIL_VARIANTS, batch_size, rebuild)
+        users = self.backfill(get_user_model(), 'profile_picture', AVATAR_VARIANTS, batch_size, rebuild)
+        if contributions or users:
+            bump_versions('contributions')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored image variants of {contributions} contributions and {users} users."
+        ))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from contributions.bulk_import import ManifestError, parse_manifest, run_import, ndjson_lines
+
+
+class Command(BaseCommand):
+    help = "Import contributions with their videos and notes from a JSON or CSV manifest; prints one NDJSON result per contribution."
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="Path to the manifest file.")
+        parser.add_argument('--user', required=True, help="Username or email of the creator.")
+        parser.add_argument('--format', choices=['json', 'csv'], help="Manifest format; guessed from the file when omitted.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = User.objects.filter(username=options['user']).first() or User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"User {options['user']!r} not found.")
+
+        fmt = options['format'] or ('csv' if options['manifest'].lower().endswith('.csv') else None)
+        with open(options['manifest'], 'rb') as manifest:
+            try:
+                entries = parse_manifest(manifest.read(), fmt)
+            except ManifestError as e:
+                raise CommandError(str(e))
+
+        for line in ndjson_lines(run_import(user, entries)):
+            self.stdout.write(line, ending='')
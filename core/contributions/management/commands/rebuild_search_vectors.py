@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from contributions.models import Contributions
+from contributions.search import normalize_course_code, update_search_vector
+
+
+class Command(BaseCommand):
+    help = "Backfill the full-text search vector and normalized course code of contributions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--missing-only', action='store_true', help="Only rows without a search vector.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Contributions.objects.order_by('pk')
+        if options['missing_only']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        updated = 0
+        last_pk = None
+        while True:
+            batch = queryset
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(batch.only('pk', 'course_code')[:batch_size])
+            if not rows:
+                break
+            for row in rows:
+                row.course_code_normalized = normalize_course_code(row.course_code)
+            Contributions.objects.bulk_update(rows, ['course_code_normalized'])
+            updated += update_search_vector(Contributions.objects.filter(pk__in=[row.pk for row in rows]))
+            last_pk = rows[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"Updated search vectors for {updated} contributions."))
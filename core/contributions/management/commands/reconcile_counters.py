@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contributions.models import Contributions
+from contributions.counters import reconcile_counters
+from contributions.ratings import reconcile_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill / repair the engagement counters of contributions (comment_count, enrollment_count "
+        "and the rating aggregates) in pk-ordered batches; only the rows of the current batch are locked."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0, help="Seconds to pause between batches.")
+        parser.add_argument('--skip-ratings', action='store_true', help="Leave the rating aggregates alone.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = drifted = ratings_drifted = 0
+        last_pk = None
+        while True:
+            queryset = Contributions.objects.order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            drifted += reconcile_counters(pks)
+            if not options['skip_ratings']:
+                ratings_drifted += reconcile_rating_aggregates(pks)
+            checked += len(pks)
+            last_pk = pks[-1]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} contributions, repaired counters of {drifted} and rating aggregates of {ratings_drifted}."
+        ))
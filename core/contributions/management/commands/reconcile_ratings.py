@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from contributions.models import Contributions
+from contributions.ratings import reconcile_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Backfill / repair the stored rating aggregates and star histograms of contributions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = drifted = 0
+        last_pk = None
+        while True:
+            queryset = Contributions.objects.order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            drifted += reconcile_rating_aggregates(pks)
+            checked += len(pks)
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} contributions, repaired {drifted}."))
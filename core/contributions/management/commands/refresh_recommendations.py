@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contributions.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild co-enrollment recommendations for contributions touched by new enrollments. "
+        "Run from cron; use --rebuild periodically to pick up unenrollments and enrollment count changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute the neighbours of every contribution.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        refreshed = refresh_recommendations(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed recommendations of {refreshed} contributions in {time.monotonic() - started:.2f}s."
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contributions.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = "Fold new views, enrollments and ratings into the trending scores. Run from cron every few minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute every score from all events.")
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = refresh_trending(rebuild=options['rebuild'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated trending scores of {written} contributions in {time.monotonic() - started:.2f}s."
+        ))
@@ -6,6 +6,28 @@ from uuid import uuid4
 from django.conf import settings
 from university.models import University,Department
 from cloudinary.models import CloudinaryField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from core.image_variants import THUMBNAIL_VARIANTS, refresh_image_variants
+from .search import normalize_course_code, update_search_vector
+
+
+def exclude_denormalized_fields(instance, kwargs):
+    """
+    A plain save() of an existing row writes every column back, which would
+    clobber counters maintained elsewhere with atomic F() updates. Narrow
+    such saves to the regular columns.
+    """
+    if instance._state.adding or kwargs.get('update_fields') is not None or kwargs.get('force_insert'):
+        return kwargs
+    deferred = instance.get_deferred_fields()
+    kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key
+        and field.name not in instance.DENORMALIZED_FIELDS
+        and field.attname not in deferred
+    ]
+    return kwargs
 
 
 
@@ -20,9 +42,16 @@ class ContributionVideos(models.Model):
     total_views = models.IntegerField(default=0)   
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # maintained by the view counter flush, never by save()
+    DENORMALIZED_FIELDS = {'total_views'}
+
     class Meta:
         ordering = ['-created_at']
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **exclude_denormalized_fields(self, kwargs))
+
 
 
 
@@ -71,17 +100,43 @@ class Contributions(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='contributions', on_delete=models.CASCADE, null=True, blank=True, db_index=True)
     title = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     course_code = models.CharField(max_length=50, null=True, blank=True, db_index=True)
+    course_code_normalized = models.CharField(max_length=50, null=True, blank=True, editable=False)
     description = models.TextField(null=True, blank=True)
     thumbnail_image = CloudinaryField('thumbnail_image', blank=True, null=True)
+    # resized delivery URLs of thumbnail_image, built on save (core.image_variants)
+    thumbnail_card_url = models.URLField(max_length=500, null=True, blank=True, editable=False)
+    thumbnail_detail_url = models.URLField(max_length=500, null=True, blank=True, editable=False)
+    thumbnail_webp_url = models.URLField(max_length=500, null=True, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, default=0, decimal_places=2, null=True, blank=True, db_index=True)
     related_University = models.ForeignKey(University, related_name='contributions', on_delete=models.PROTECT, null=True, blank=True, db_index=True)
     department = models.ForeignKey(Department, related_name='contributions', on_delete=models.PROTECT, null=True, blank=True, db_index=True)  
     ratings = models.DecimalField(max_digits=3, decimal_places=2 ,default=0,null=True, blank=True, db_index=True)
+    # rating aggregates, maintained incrementally by contributions.ratings
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_star_1 = models.PositiveIntegerField(default=0)
+    rating_star_2 = models.PositiveIntegerField(default=0)
+    rating_star_3 = models.PositiveIntegerField(default=0)
+    rating_star_4 = models.PositiveIntegerField(default=0)
+    rating_star_5 = models.PositiveIntegerField(default=0)
     active = models.BooleanField(default=False, db_index=True)
     total_views=models.IntegerField(default=0)
+    # engagement counters, maintained with F() updates (see counters.py)
+    comment_count = models.PositiveIntegerField(default=0)
+    enrollment_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # columns that feed the search vector
+    SEARCH_FIELDS = {'title', 'course_code', 'description'}
+    # maintained with F() updates / by the search vector refresh, never by save()
+    DENORMALIZED_FIELDS = {
+        'total_views', 'search_vector', 'comment_count', 'enrollment_count',
+        'ratings', 'rating_sum', 'rating_count',
+        'rating_star_1', 'rating_star_2', 'rating_star_3', 'rating_star_4', 'rating_star_5',
+    }
+
     class Meta:
         ordering = ['-created_at']
 
@@ -90,16 +145,33 @@ class Contributions(models.Model):
             return self.title
         return f"Contribution {self.id}"
     
+    def save(self, *args, **kwargs):
+        self.course_code_normalized = normalize_course_code(self.course_code)
+        kwargs = exclude_denormalized_fields(self, kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'course_code' in update_fields:
+            kwargs['update_fields'] = update_fields = {*update_fields, 'course_code_normalized'}
+        update_fields = refresh_image_variants(self, 'thumbnail_image', THUMBNAIL_VARIANTS, update_fields)
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        # keep the weighted search vector in sync with the searchable columns
+        if update_fields is None or self.SEARCH_FIELDS.intersection(update_fields):
+            update_search_vector(Contributions.objects.filter(pk=self.pk))
+
     def is_enrolled(self, user):
         if not user.is_authenticated:
             return False
-        return self.enrollements.filter(user=user).exists()
+        from enrollment.membership import enrolled_contribution_ids
+        return str(self.pk) in enrolled_contribution_ids(user.pk)
 
     def update_average_rating(self):
-        from django.db.models import Avg
-        avg_rating = self.contribution_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
-        self.ratings = round(float(avg_rating), 2)
-        self.save(update_fields=['ratings'])
+        """
+        Recompute the rating aggregates from scratch (votes update them incrementally).
+        """
+        from .ratings import reconcile_rating_aggregates
+        reconcile_rating_aggregates([self.pk])
+        self.refresh_from_db(fields=['ratings', 'rating_sum', 'rating_count'])
 
 
 
@@ -113,10 +185,14 @@ class Contributions(models.Model):
             # Filter: active + department
             models.Index(fields=['active', 'department', '-created_at']),
 
-            # Filter: active + course_code
-            models.Index(fields=['active', 'course_code', '-created_at']),
+            # Filter: active + course_code (normalized, exact match)
+            models.Index(fields=['active', 'course_code_normalized', '-created_at']),
             models.Index(fields=['title']),  # for search
             models.Index(fields=['course_code']),  # for search
+            GinIndex(fields=['search_vector'], name='contributions_search_gin'),  # full-text search
+            # fuzzy matching (pg_trgm)
+            GinIndex(fields=['course_code_normalized'], opclasses=['gin_trgm_ops'], name='contributions_code_trgm'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='contributions_title_trgm'),
         ]
 
 
@@ -149,3 +225,62 @@ class ContributionsComments(models.Model):
 
     
     
+
+
+class ContributionTrending(models.Model):
+    """
+    Trending score of a contribution, maintained by contributions.trending.
+    `log_score` is the log of the decayed engagement expressed at a fixed epoch,
+    so rows only change when new events arrive and the ordering holds at any time.
+    active / university / department are copied from the contribution so that
+    every trending listing is one index range scan on this table.
+    """
+    contribution = models.OneToOneField('Contributions', on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    log_score = models.FloatField()
+    active = models.BooleanField(default=False)
+    university = models.ForeignKey(University, on_delete=models.CASCADE, null=True, blank=True, related_name='+', db_constraint=False)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True, related_name='+', db_constraint=False)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['active', '-log_score', '-contribution'], name='trending_score_idx'),
+            models.Index(fields=['active', 'university', '-log_score', '-contribution'], name='trending_university_idx'),
+            models.Index(fields=['active', 'department', '-log_score', '-contribution'], name='trending_department_idx'),
+            models.Index(fields=['-computed_at'], name='trending_computed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Trending {self.contribution_id} ({self.log_score:.3f})"
+
+
+class ContributionRecommendation(models.Model):
+    """
+    Top-K "enrolled in this also took" neighbours of a contribution, by cosine
+    similarity of their enrollments; built by contributions.recommendations.
+    """
+    contribution = models.ForeignKey('Contributions', on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey('Contributions', on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contribution', 'rank'], name='recommendation_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.contribution_id} -> {self.recommended_id} ({self.score:.3f})"
+
+
+class RecommendationCheckpoint(models.Model):
+    """
+    Enrollment cutoff of the last successful recommendations refresh.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.started_at}"
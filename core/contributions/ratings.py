@@ -0,0 +1,161 @@
+"""
+Incrementally maintained rating aggregates.
+
+Each Contributions row keeps rating_sum, rating_count and a per-star
+histogram (rating_star_1 .. rating_star_5). A vote applies its delta with
+one atomic UPDATE in the same transaction as the rating row itself, so the
+cost of a vote no longer grows with the number of votes.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest, Round
+
+STARS = (1, 2, 3, 4, 5)
+STAR_FIELDS = {star: f'rating_star_{star}' for star in STARS}
+AGGREGATE_FIELDS = ['rating_sum', 'rating_count', *STAR_FIELDS.values(), 'ratings']
+
+
+def to_rating(value):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def star_bucket(rating):
+    """
+    Histogram bucket of a rating: rounded half up and clamped to 1..5 (a 0 counts as one star).
+    """
+    star = int(to_rating(rating).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    return min(max(star, 1), 5)
+
+
+def _star_filter(star):
+    # the SQL twin of star_bucket()
+    if star == 1:
+        return Q(rating__lt=Decimal('1.5'))
+    if star == 5:
+        return Q(rating__gte=Decimal('4.5'))
+    return Q(rating__gte=Decimal(star) - Decimal('0.5'), rating__lt=Decimal(star) + Decimal('0.5'))
+
+
+def apply_rating_change(contribution_id, old, new):
+    """
+    Move a contribution's aggregates from an old vote to a new one (either may be None).
+    Counts never drop below zero: a vote that was never aggregated (rows from before
+    reconcile_ratings, the admin or fixtures) can still be deleted.
+    """
+    from .models import Contributions
+
+    old, new = to_rating(old), to_rating(new)
+    sum_delta = (new or 0) - (old or 0)
+    count_delta = (new is not None) - (old is not None)
+
+    star_deltas = {}
+    if old is not None:
+        star_deltas[star_bucket(old)] = star_deltas.get(star_bucket(old), 0) - 1
+    if new is not None:
+        star_deltas[star_bucket(new)] = star_deltas.get(star_bucket(new), 0) + 1
+
+    new_sum = Greatest(F('rating_sum') + sum_delta, Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2))
+    new_count = Greatest(F('rating_count') + count_delta, Value(0))
+    updates = {
+        'rating_sum': new_sum,
+        'rating_count': new_count,
+        # every right-hand side reads the pre-update row, so the average uses the same deltas
+        'ratings': Case(
+            When(
+                Q(rating_count__gt=-count_delta),
+                then=Round(
+                    ExpressionWrapper(new_sum / new_count, output_field=DecimalField(max_digits=12, decimal_places=4)),
+                    2,
+                ),
+            ),
+            default=Value(Decimal('0')),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    }
+    for star, delta in star_deltas.items():
+        if delta:
+            updates[STAR_FIELDS[star]] = Greatest(F(STAR_FIELDS[star]) + delta, Value(0))
+
+    Contributions.objects.filter(pk=contribution_id).update(**updates)
+
+
+def submit_rating(user, contribution, value):
+    """
+    Create or change the user's vote and apply the delta to the aggregates atomically.
+    Returns the rating row and whether it was created.
+    """
+    from .models import ContributionRatings, Contributions
+
+    with transaction.atomic():
+        # Lock the contribution row first: the aggregate UPDATE takes that lock anyway,
+        # and without it two concurrent first votes of one user would both read old=None.
+        Contributions.objects.select_for_update().filter(pk=contribution.pk).values_list('pk', flat=True).first()
+        old = (
+            ContributionRatings.objects
+            .filter(user=user, contribution=contribution)
+            .values_list('rating', flat=True)
+            .first()
+        )
+        rating_obj, created = ContributionRatings.objects.update_or_create(
+            user=user,
+            contribution=contribution,
+            defaults={'rating': to_rating(value)},
+        )
+        apply_rating_change(contribution.pk, None if created else old, rating_obj.rating)
+    return rating_obj, created
+
+
+def compute_rating_aggregates(contribution_ids):
+    """
+    Recompute the aggregates of the given contributions from their rating rows.
+    Returns {contribution_id: {field: value}} for every id, zeros included.
+    """
+    from .models import ContributionRatings
+
+    rows = (
+        ContributionRatings.objects.filter(contribution_id__in=contribution_ids, rating__isnull=False)
+        .order_by()
+        .values('contribution_id')
+        .annotate(
+            rating_sum=Sum('rating'),
+            rating_count=Count('id'),
+            **{field: Count('id', filter=_star_filter(star)) for star, field in STAR_FIELDS.items()},
+        )
+    )
+    empty = {'rating_sum': Decimal('0'), 'rating_count': 0, **{field: 0 for field in STAR_FIELDS.values()}}
+    aggregates = {pk: dict(empty) for pk in contribution_ids}
+    for row in rows:
+        aggregates[row.pop('contribution_id')] = row
+    for values in aggregates.values():
+        count = values['rating_count']
+        values['ratings'] = round(values['rating_sum'] / count, 2) if count else Decimal('0')
+    return aggregates
+
+
+def reconcile_rating_aggregates(contribution_ids):
+    """
+    Rewrite the stored aggregates of a batch of contributions. The batch rows are
+    locked only for the duration of this call. Returns the number of rows that had drifted.
+    """
+    from .models import Contributions
+
+    with transaction.atomic():
+        contributions = list(
+            Contributions.objects.select_for_update().filter(pk__in=contribution_ids).only(*AGGREGATE_FIELDS)
+        )
+        aggregates = compute_rating_aggregates([c.pk for c in contributions])
+        drifted = []
+        for contribution in contributions:
+            values = aggregates[contribution.pk]
+            if any(getattr(contribution, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(contribution, field, value)
+                drifted.append(contribution)
+        if drifted:
+            Contributions.objects.bulk_update(drifted, AGGREGATE_FIELDS)
+    return len(drifted)
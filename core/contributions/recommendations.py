@@ -0,0 +1,191 @@
+"""
+Co-enrollment recommendations ("students who enrolled in this also took").
+
+Enrollments form a sparse binary user x contribution matrix X. The
+co-enrollment counts are C = X.T @ X, and two contributions are as similar
+as the cosine of their enrollment vectors, C[i, j] / sqrt(n_i * n_j), where
+n_i is the number of students enrolled in i. The best TOP_K neighbours of
+each contribution are stored in ContributionRecommendation and served with
+one lookup on (contribution, rank).
+
+An incremental refresh only rebuilds the contributions of every student
+who enrolled since the last run (the cutoff kept in RecommendationCheckpoint),
+and their rows of C only involve the enrollments of the students who took
+them. Other contributions keep their stored rows, although a new enrollment
+in j also changes n_j and with it every stored similarity to j, so their
+scores and ranks drift until the periodic --rebuild, which also picks up
+unenrollments.
+"""
+
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from scipy import sparse
+
+from core.response_cache import bump_versions
+
+CHECKPOINT = 'recommendations'
+WRITE_BATCH_SIZE = 500
+# enrollments are stamped before their transaction commits; leave a margin so none is skipped
+COMMIT_LAG = timedelta(seconds=60)
+
+
+def _top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 10)
+
+
+def _min_common():
+    return getattr(settings, 'RECOMMENDATIONS_MIN_COMMON', 1)
+
+
+def enrollment_matrix(pairs):
+    """
+    (X as CSR, contribution ids) from (user_id, contribution_id) pairs.
+    """
+    user_codes, contribution_codes = {}, {}
+    rows, cols = [], []
+    for user_id, contribution_id in pairs:
+        rows.append(user_codes.setdefault(user_id, len(user_codes)))
+        cols.append(contribution_codes.setdefault(contribution_id, len(contribution_codes)))
+    data = np.ones(len(rows), dtype=np.float32)
+    matrix = sparse.csr_matrix(
+        (data, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+        shape=(len(user_codes), len(contribution_codes)),
+    )
+    # a duplicate pair would be summed; enrollment is binary
+    matrix.data[:] = 1
+    return matrix, list(contribution_codes)
+
+
+def similarity_rows(matrix, row_codes, enrolled_counts):
+    """
+    Cosine similarity rows (CSR, one per code in row_codes) of the contributions of X.
+    enrolled_counts holds n_j for every column of X.
+    """
+    columns = matrix[:, row_codes].T.tocsr()
+    common = (columns @ matrix).tocsr()
+    common.data[common.data < _min_common()] = 0
+    common.eliminate_zeros()
+    norms = np.sqrt(np.asarray(enrolled_counts, dtype=np.float64))
+    scaled = sparse.diags(1 / norms[row_codes]) @ common @ sparse.diags(1 / norms)
+    return sparse.csr_matrix(scaled)
+
+
+def top_neighbours(similarity, row_codes, k):
+    """
+    [(row code, [(column code, score), ...best first])] without self-matches.
+    """
+    result = []
+    for position, code in enumerate(row_codes):
+        start, end = similarity.indptr[position], similarity.indptr[position + 1]
+        columns = similarity.indices[start:end]
+        scores = similarity.data[start:end]
+        keep = columns != code
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((columns, -scores))
+        result.append((code, list(zip(columns[order].tolist(), scores[order].tolist()))))
+    return result
+
+
+def _store(neighbours, contribution_ids, computed_at):
+    from .models import ContributionRecommendation
+
+    iterator = iter(neighbours)
+    while True:
+        batch = list(islice(iterator, WRITE_BATCH_SIZE))
+        if not batch:
+            break
+        with transaction.atomic():
+            ContributionRecommendation.objects.filter(
+                contribution_id__in=[contribution_ids[code] for code, _ in batch]
+            ).delete()
+            ContributionRecommendation.objects.bulk_create([
+                ContributionRecommendation(
+                    contribution_id=contribution_ids[code],
+                    recommended_id=contribution_ids[other],
+                    rank=rank,
+                    score=score,
+                    computed_at=computed_at,
+                )
+                for code, ranked in batch
+                for rank, (other, score) in enumerate(ranked, start=1)
+            ])
+
+
+def _last_run():
+    from .models import RecommendationCheckpoint
+
+    return RecommendationCheckpoint.objects.filter(name=CHECKPOINT).values_list('started_at', flat=True).first()
+
+
+def _record_run(started_at):
+    from .models import RecommendationCheckpoint
+
+    RecommendationCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={'started_at': started_at})
+
+
+def refresh_recommendations(rebuild=False):
+    """
+    Rebuild the neighbours of contributions touched by enrollments since the last run
+    (of all contributions with rebuild=True). Returns the number of contributions refreshed.
+    """
+    from enrollment.models import Enrollement
+    from .models import ContributionRecommendation
+
+    now = timezone.now() - COMMIT_LAG
+    since = None if rebuild else _last_run()
+
+    enrollments = Enrollement.objects.order_by()
+    if since is not None:
+        new_students = Enrollement.objects.filter(enrolled_at__gt=since, enrolled_at__lte=now).values('user_id')
+        touched = Enrollement.objects.filter(user_id__in=new_students).values('contribution_id')
+        # every student of a touched contribution shares a row of C with it
+        enrollments = enrollments.filter(user_id__in=Enrollement.objects.filter(contribution_id__in=touched).values('user_id'))
+        targets = set(touched.values_list('contribution_id', flat=True).distinct())
+        if not targets:
+            _record_run(now)
+            return 0
+    else:
+        enrollments = enrollments.filter(enrolled_at__lte=now)
+    pairs = enrollments.values_list('user_id', 'contribution_id').iterator(chunk_size=10000)
+    matrix, contribution_ids = enrollment_matrix(pairs)
+    if not contribution_ids:
+        if rebuild:
+            ContributionRecommendation.objects.all().delete()
+        _record_run(now)
+        return 0
+
+    if since is None:
+        row_codes = np.arange(len(contribution_ids))
+        enrolled_counts = np.asarray(matrix.sum(axis=0)).ravel()
+    else:
+        codes = {pk: code for code, pk in enumerate(contribution_ids)}
+        row_codes = np.array(sorted(codes[pk] for pk in targets if pk in codes), dtype=np.int64)
+        # X only holds the neighbourhood's students; n_j must count everyone
+        totals = dict(
+            Enrollement.objects.filter(contribution_id__in=contribution_ids).order_by()
+            .values_list('contribution_id').annotate(count=Count('id'))
+        )
+        enrolled_counts = [totals.get(pk, 1) for pk in contribution_ids]
+
+    k = _top_k()
+    neighbours = []
+    for start in range(0, len(row_codes), WRITE_BATCH_SIZE):
+        chunk = row_codes[start:start + WRITE_BATCH_SIZE]
+        neighbours.extend(top_neighbours(similarity_rows(matrix, chunk, enrolled_counts), chunk, k))
+
+    if rebuild:
+        ContributionRecommendation.objects.exclude(contribution_id__in=contribution_ids).delete()
+    _store(neighbours, contribution_ids, now)
+    # only once everything is stored, so a failed run is retried from the old cutoff
+    _record_run(now)
+    bump_versions('recommendations')
+    return len(neighbours)
@@ -0,0 +1,105 @@
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import Greatest
+
+
+SEARCH_CONFIG = 'english'
+
+_COURSE_CODE_JUNK = re.compile(r'[^0-9A-Z]')
+
+
+def normalize_course_code(course_code):
+    """
+    Canonical form of a course code: "cse 220", "CSE-220" and "cse220" all become "CSE220".
+    """
+    if not course_code:
+        return None
+    return _COURSE_CODE_JUNK.sub('', course_code.upper()) or None
+
+
+def contribution_search_vector():
+    """
+    Weighted tsvector for a contribution: title (A) > course_code (B) > description (C).
+    """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('course_code', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(queryset):
+    """
+    Recompute the stored search vector for every row of the queryset in one UPDATE.
+    """
+    return queryset.update(search_vector=contribution_search_vector())
+
+
+def search_contributions(queryset, search, highlight=False):
+    """
+    Filter a contributions queryset with the GIN-indexed search vector
+    and order it by relevance. With highlight, each row gets a `headline`
+    snippet of the description with the matched terms wrapped in <b> tags.
+    """
+    query = SearchQuery(search, search_type='websearch', config=SEARCH_CONFIG)
+    queryset = queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    )
+    if highlight:
+        queryset = queryset.annotate(
+            headline=SearchHeadline(
+                'description',
+                query,
+                config=SEARCH_CONFIG,
+                start_sel='<b>',
+                stop_sel='</b>',
+                max_words=35,
+                min_words=15,
+            )
+        )
+    return queryset.order_by('-rank', '-created_at')
+
+
+def fuzzy_contributions(queryset, term):
+    """
+    Trigram match of a loosely typed term against the normalized course code
+    and the title, best matches first. Both columns have gin_trgm_ops indexes.
+    """
+    code = normalize_course_code(term) or ''
+    queryset = queryset.filter(
+        Q(course_code_normalized__trigram_similar=code) | Q(title__trigram_similar=term)
+    ).annotate(
+        similarity=Greatest(
+            TrigramSimilarity('course_code_normalized', code),
+            TrigramSimilarity('title', term),
+        )
+    )
+    return queryset.order_by('-similarity', '-created_at')
+
+
+def suggest_course_codes(queryset, term, limit=5):
+    """
+    Closest known course codes for a term, one row per normalized code:
+    [{'course_code': 'CSE220', 'display': 'CSE 220', 'contributions': 4, 'similarity': 0.44}, ...]
+    """
+    code = normalize_course_code(term)
+    if not code:
+        return []
+    rows = (
+        queryset.filter(course_code_normalized__trigram_similar=code)
+        .values('course_code_normalized')
+        .annotate(display=Min('course_code'), contributions=Count('id'))
+        .annotate(similarity=TrigramSimilarity('course_code_normalized', code))
+        .order_by('-similarity', '-contributions')[:limit]
+    )
+    return [
+        {
+            'course_code': row['course_code_normalized'],
+            'display': row['display'],
+            'contributions': row['contributions'],
+            'similarity': round(row['similarity'], 3),
+        }
+        for row in rows
+    ]
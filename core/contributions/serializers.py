@@ -2,6 +2,9 @@ from typing import Required
 from rest_framework import serializers
 from .models import  Contributions, ContributionVideos, ContributionNotes, ContributionsComments, ContributionRatings
 from university.models import University,Department
+from .ratings import STAR_FIELDS
+from .trending import current_score
+from core.image_variants import VariantURLField
 
 class UniversitySerializer(serializers.ModelSerializer):
     class Meta:
@@ -55,12 +58,15 @@ class ContributionRatingsSerializer(serializers.ModelSerializer):
 class BasicContributionsSerializer(serializers.ModelSerializer):
     department = DepartmentSerializer(read_only=True)
     related_University = UniversitySerializer(read_only=True)
-    thumbnail_image = serializers.ImageField(read_only=True)
+    # stored card-size variants, no per-row URL building
+    thumbnail_image = VariantURLField(source='thumbnail_card_url', image='thumbnail_image')
+    thumbnail_webp = VariantURLField(source='thumbnail_webp_url', image='thumbnail_image')
     
     class Meta:
         model = Contributions
-        fields = ['id', 'title', 'price' ,'course_code','thumbnail_image','department','related_University','ratings','total_views', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at','total_views', 'updated_at']
+        fields = ['id', 'title', 'price' ,'course_code','thumbnail_image','thumbnail_webp','department','related_University','ratings','total_views',
+                  'comment_count', 'rating_count', 'enrollment_count', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at','total_views', 'comment_count', 'rating_count', 'enrollment_count', 'updated_at']
 
     def validate(self, attrs):
 
@@ -76,19 +82,68 @@ class BasicContributionsSerializer(serializers.ModelSerializer):
         return super().validate(attrs)
 
 
+class SearchContributionsSerializer(BasicContributionsSerializer):
+    """
+    Search result card with the highlighted description snippet.
+    """
+    headline = serializers.CharField(read_only=True)
+
+    class Meta(BasicContributionsSerializer.Meta):
+        fields = BasicContributionsSerializer.Meta.fields + ['headline']
+
+
+
+
+class TrendingScoreField(serializers.ReadOnlyField):
+    """
+    The current decayed trending score from a stored log score.
+    """
+
+    def to_representation(self, value):
+        return round(current_score(value), 4)
+
+
+class TrendingContributionsSerializer(BasicContributionsSerializer):
+    """
+    Cards of the trending listing; needs the `trending_log_score` annotation.
+    """
+    trending_score = TrendingScoreField(source='trending_log_score')
+
+    class Meta(BasicContributionsSerializer.Meta):
+        fields = BasicContributionsSerializer.Meta.fields + ['trending_score']
+
+class RecommendedContributionsSerializer(BasicContributionsSerializer):
+    """
+    Recommendation cards; needs the `similarity` annotation.
+    """
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(BasicContributionsSerializer.Meta):
+        fields = BasicContributionsSerializer.Meta.fields + ['similarity']
+
+
+
+class RatingHistogramSerializer(serializers.Serializer):
+    """
+    Votes per star: {"1": 0, "2": 1, "3": 4, "4": 10, "5": 25}
+    """
+    def get_fields(self):
+        return {str(star): serializers.IntegerField(source=field, read_only=True) for star, field in STAR_FIELDS.items()}
 
 
 class ContributionDetailSerializer(serializers.ModelSerializer):
     contributionVideos = ContributionVideosListSerializer(many=True)
     contributionNotes = ContributionNotesListSerializer(many=True)
-    thumbnail_image = serializers.ImageField(read_only=True)
+    thumbnail_image = VariantURLField(source='thumbnail_detail_url', image='thumbnail_image')
 
     author_name = serializers.CharField(source='user.username', read_only=True)
-    author_image = serializers.ImageField(source='user.profile_picture', read_only=True)
+    author_image = VariantURLField(source='user.avatar_url', image='user.profile_picture')
+    author_image_webp = VariantURLField(source='user.avatar_webp_url', image='user.profile_picture')
+    rating_histogram = RatingHistogramSerializer(source='*', read_only=True)
 
     class Meta:
         model = Contributions
-        fields = ['id','user','author_name','author_image','title','course_code','description','thumbnail_image','price','related_University','department','ratings','total_views','active','created_at','contributionVideos','contributionNotes']
+        fields = ['id','user','author_name','author_image','author_image_webp','title','course_code','description','thumbnail_image','price','related_University','department','ratings','rating_count','rating_histogram','total_views','active','created_at','contributionVideos','contributionNotes']
 
 
 
@@ -178,7 +233,7 @@ class ContributionsSerializer(serializers.ModelSerializer):
 class ContributionsCommentsSerializer(serializers.ModelSerializer):
     # get user image and username
     user=serializers.StringRelatedField(read_only=True)
-    profile_picture = serializers.ImageField(source='user.profile_picture', read_only=True)
+    profile_picture = VariantURLField(source='user.avatar_url', image='user.profile_picture')
     contribution = serializers.StringRelatedField(read_only=True)
 
     class Meta:
@@ -187,6 +242,19 @@ class ContributionsCommentsSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'profile_picture', 'contribution', 'created_at', 'updated_at']
 
 
+class CommentListSerializer(serializers.ModelSerializer):
+    """
+    Comments listed under their contribution; the contribution itself is not repeated.
+    """
+    user = serializers.StringRelatedField(read_only=True)
+    profile_picture = VariantURLField(source='user.avatar_url', image='user.profile_picture')
+
+    class Meta:
+        model = ContributionsComments
+        fields = ['id', 'comment', 'user', 'profile_picture', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
 
 
 class UserContributionsSerializer(serializers.ModelSerializer):
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.response_cache import bump_versions_on_commit
+from .counters import bump_counter, deleted_with_contribution
+from .models import Contributions, ContributionVideos, ContributionNotes, ContributionsComments, ContributionRatings
+from .ratings import apply_rating_change
+from .trending import sync_trending_filters
+
+
+@receiver([post_save, post_delete], sender=Contributions)
+def contribution_changed(sender, instance, **kwargs):
+    bump_versions_on_commit('contributions', f'contribution:{instance.pk}')
+
+
+@receiver(post_save, sender=Contributions)
+def contribution_saved(sender, instance, created, **kwargs):
+    if not created:
+        sync_trending_filters(instance)
+
+
+@receiver([post_save, post_delete], sender=ContributionVideos)
+@receiver([post_save, post_delete], sender=ContributionNotes)
+def contribution_content_changed(sender, instance, **kwargs):
+    if instance.contribution_id:
+        bump_versions_on_commit(f'contribution:{instance.contribution_id}')
+
+
+@receiver(post_save, sender=ContributionsComments)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_counter(instance.contribution_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=ContributionsComments)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    # skipped when the whole contribution is being deleted: one UPDATE per comment for nothing
+    if not deleted_with_contribution(origin):
+        bump_counter(instance.contribution_id, 'comment_count', -1)
+
+
+@receiver(post_delete, sender=ContributionRatings)
+def rating_deleted(sender, instance, origin=None, **kwargs):
+    # votes are created/changed through ratings.submit_rating, which keeps the aggregates itself
+    if not deleted_with_contribution(origin):
+        apply_rating_change(instance.contribution_id, instance.rating, None)
@@ -1,3 +1,648 @@
-from django.test import TestCase
+import io
+import json
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from accounts.tokens import UserRefreshToken
+from university.models import Department, University
+from enrollment.models import Enrollement
+from core.query_planning import apply_query_plan
+from core.response_cache import current_versions
+from .models import (Contributions, ContributionNotes, ContributionRatings, ContributionRecommendation, ContributionsComments,
+                     ContributionTrending, ContributionVideos)
+from . import recommendations
+from .bulk_import import validate_manifest
+from .counters import bump_counter, reconcile_counters
+from .ratings import reconcile_rating_aggregates, submit_rating
+from .recommendations import refresh_recommendations
+from .serializers import BasicContributionsSerializer, CommentListSerializer, ContributionDetailSerializer
+from .trending import current_score, refresh_trending
+from .utils import stream_json_response
+
+
+def assert_no_per_row_queries(serializer_class, queryset, rows=5):
+    """
+    Fail when rendering `rows` rows costs more queries than rendering one,
+    i.e. the serializer reads a relation the queryset did not load.
+    """
+    with CaptureQueriesContext(connection) as single:
+        serializer_class(list(queryset[:1]), many=True).data
+    with CaptureQueriesContext(connection) as several:
+        instances = list(queryset[:rows])
+        serializer_class(instances, many=True).data
+
+    if len(several) > len(single):
+        extra = [query['sql'] for query in several.captured_queries[len(single):]]
+        raise AssertionError(
+            f"{serializer_class.__name__} ran {len(several)} queries for {len(instances)} rows "
+            f"but {len(single)} for one row; extra queries:\n" + "\n".join(extra)
+        )
+
+
+def make_users(count):
+    return [User.objects.create(username=f'user{n}', email=f'user{n}@example.com') for n in range(count)]
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.voters = make_users(3)
+        self.contribution = Contributions.objects.create(title='Algorithms', active=True)
+
+    def aggregates(self):
+        return Contributions.objects.values(
+            'ratings', 'rating_sum', 'rating_count', 'rating_star_1', 'rating_star_4', 'rating_star_5',
+        ).get(pk=self.contribution.pk)
+
+    def test_votes_update_the_aggregates(self):
+        submit_rating(self.voters[0], self.contribution, 5)
+        submit_rating(self.voters[1], self.contribution, 4)
+        _rating, created = submit_rating(self.voters[2], self.contribution, 1)
+
+        self.assertTrue(created)
+        self.assertEqual(self.aggregates(), {
+            'ratings': Decimal('3.33'), 'rating_sum': Decimal('10'), 'rating_count': 3,
+            'rating_star_1': 1, 'rating_star_4': 1, 'rating_star_5': 1,
+        })
+
+    def test_changing_a_vote_moves_it(self):
+        submit_rating(self.voters[0], self.contribution, 5)
+        _rating, created = submit_rating(self.voters[0], self.contribution, 4)
+
+        self.assertFalse(created)
+        self.assertEqual(self.aggregates(), {
+            'ratings': Decimal('4'), 'rating_sum': Decimal('4'), 'rating_count': 1,
+            'rating_star_1': 0, 'rating_star_4': 1, 'rating_star_5': 0,
+        })
+
+    def test_deleting_a_vote_removes_it(self):
+        submit_rating(self.voters[0], self.contribution, 5)
+        submit_rating(self.voters[1], self.contribution, 4)
+        ContributionRatings.objects.get(user=self.voters[0]).delete()
+
+        aggregates = self.aggregates()
+        self.assertEqual((aggregates['ratings'], aggregates['rating_count'], aggregates['rating_star_5']), (Decimal('4'), 1, 0))
+
+    def test_deleting_an_unaggregated_vote_stops_at_zero(self):
+        # created around submit_rating, like votes from before the aggregates existed
+        ContributionRatings.objects.create(user=self.voters[0], contribution=self.contribution, rating=Decimal('5'))
+        ContributionRatings.objects.get(user=self.voters[0]).delete()
+
+        self.assertEqual(self.aggregates(), {
+            'ratings': Decimal('0'), 'rating_sum': Decimal('0'), 'rating_count': 0,
+            'rating_star_1': 0, 'rating_star_4': 0, 'rating_star_5': 0,
+        })
+
+    def test_reconcile_rewrites_drifted_rows(self):
+        submit_rating(self.voters[0], self.contribution, 4)
+        Contributions.objects.filter(pk=self.contribution.pk).update(rating_count=7, ratings=Decimal('1'))
+
+        self.assertEqual(reconcile_rating_aggregates([self.contribution.pk]), 1)
+        self.assertEqual(reconcile_rating_aggregates([self.contribution.pk]), 0)
+        aggregates = self.aggregates()
+        self.assertEqual((aggregates['ratings'], aggregates['rating_count']), (Decimal('4'), 1))
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        for n, user in enumerate(make_users(5)):
+            contribution = Contributions.objects.create(title=f'Course {n}', active=True, user=user)
+            ContributionVideos.objects.create(contribution=contribution, title='Intro')
+            ContributionsComments.objects.create(contribution=contribution, user=user, comment='Helpful')
+
+    def test_listing_serializers_load_everything_up_front(self):
+        for serializer_class, queryset in (
+            (BasicContributionsSerializer, Contributions.objects.all()),
+            (ContributionDetailSerializer, Contributions.objects.all()),
+            (CommentListSerializer, ContributionsComments.objects.all()),
+        ):
+            with self.subTest(serializer=serializer_class.__name__):
+                assert_no_per_row_queries(serializer_class, apply_query_plan(queryset, serializer_class))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CommentPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        users = make_users(5)
+        self.contribution = Contributions.objects.create(title='Databases', active=True)
+        start = timezone.now() - timedelta(hours=1)
+        for n, user in enumerate(users):
+            comment = ContributionsComments.objects.create(contribution=self.contribution, user=user, comment=f'by {user}')
+            ContributionsComments.objects.filter(pk=comment.pk).update(created_at=start + timedelta(minutes=n))
+        self.url = f'/api/contributions/{self.contribution.pk}/get-comments/'
+
+    def test_legacy_response_by_default(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'message', 'data'})
+        self.assertEqual(len(response.json()['data']), 5)
+
+    def test_cursor_pages_are_opt_in(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2})
+        page = response.json()
+
+        self.assertEqual(page['count'], 5)
+        self.assertEqual([c['comment'] for c in page['results']], ['by user4', 'by user3'])
+
+        seen = [c['id'] for c in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            seen += [c['id'] for c in page['results']]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CourseCodeFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Contributions.objects.create(title='Data Structures', course_code='CSE 220', active=True)
+        Contributions.objects.create(title='No code', active=True)
+
+    def titles(self, response):
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [row['title'] for row in body.get('results', body.get('data', []))]
+
+    def test_codes_are_matched_normalized(self):
+        response = self.client.get('/api/contributions/all-contributions/', {'course_code': 'cse-220'})
+        self.assertEqual(self.titles(response), ['Data Structures'])
+
+    def test_code_without_characters_matches_nothing(self):
+        response = self.client.get('/api/contributions/all-contributions/', {'course_code': '---'})
+        self.assertEqual(self.titles(response), [])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "trigram similarity needs PostgreSQL")
+    def test_suggestion_limit_is_clamped(self):
+        response = self.client.get('/api/contributions/course-codes/suggest/', {'q': 'CSE220', 'limit': '-3'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TRENDING_COMMIT_LAG_SECONDS=0, TRENDING_HALF_LIFE_HOURS=48)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_users(3)
+        self.recent = Contributions.objects.create(title='Recent', active=True)
+        self.older = Contributions.objects.create(title='Older', active=True)
+
+    def enroll(self, student, contribution, hours_ago=0):
+        enrollment = Enrollement.objects.create(user=student, contribution=contribution)
+        Enrollement.objects.filter(pk=enrollment.pk).update(enrolled_at=timezone.now() - timedelta(hours=hours_ago))
+
+    def scores(self):
+        return dict(ContributionTrending.objects.values_list('contribution_id', 'log_score'))
+
+    def test_events_decay_with_the_half_life(self):
+        self.enroll(self.students[0], self.recent)
+        self.enroll(self.students[1], self.recent)
+        # two half-lives ago
+        self.enroll(self.students[2], self.older, hours_ago=96)
+
+        self.assertEqual(refresh_trending(), 2)
+        scores = self.scores()
+        self.assertAlmostEqual(current_score(scores[self.recent.pk]), 10, places=2)
+        self.assertAlmostEqual(current_score(scores[self.older.pk]), 1.25, places=2)
+
+    def test_incremental_refresh_matches_a_rebuild(self):
+        self.enroll(self.students[0], self.recent, hours_ago=10)
+        refresh_trending()
+        self.enroll(self.students[1], self.recent)
+        self.enroll(self.students[2], self.older)
+
+        self.assertEqual(refresh_trending(), 2)
+        incremental = self.scores()
+        refresh_trending(rebuild=True)
+        for pk, log_score in self.scores().items():
+            self.assertAlmostEqual(incremental[pk], log_score)
+
+    def test_tied_scores_page_in_a_stable_order(self):
+        tied = [self.recent, self.older, *(Contributions.objects.create(title=f'Tied {n}', active=True) for n in range(3))]
+        ContributionTrending.objects.bulk_create([
+            ContributionTrending(contribution=contribution, log_score=1.0, active=True, computed_at=timezone.now())
+            for contribution in tied
+        ])
+
+        page = self.client.get('/api/contributions/trending/', {'page_size': 2}).json()
+        seen = [row['id'] for row in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            seen += [row['id'] for row in page['results']]
+        self.assertEqual(seen, sorted((str(contribution.pk) for contribution in tied), reverse=True))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+@mock.patch.object(recommendations, 'COMMIT_LAG', timedelta(0))
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_users(4)
+        self.algorithms, self.databases, self.networks = (
+            Contributions.objects.create(title=title, active=True) for title in ('Algorithms', 'Databases', 'Networks')
+        )
+
+    def enroll(self, student, *contributions):
+        for contribution in contributions:
+            Enrollement.objects.create(user=student, contribution=contribution)
+
+    def titles(self, contribution):
+        response = self.client.get(f'/api/contributions/{contribution.pk}/recommendations/')
+        return [row['title'] for row in response.json()['data']]
+
+    def test_neighbours_are_ranked_by_cosine_similarity(self):
+        self.enroll(self.students[0], self.algorithms, self.databases)
+        self.enroll(self.students[1], self.algorithms, self.databases)
+        self.enroll(self.students[2], self.algorithms, self.networks)
+
+        self.assertEqual(refresh_recommendations(), 3)
+        self.assertEqual(self.titles(self.algorithms), ['Databases', 'Networks'])
+        self.assertEqual(self.titles(self.networks), ['Algorithms'])
+        score = ContributionRecommendation.objects.get(contribution=self.algorithms, rank=1).score
+        self.assertAlmostEqual(score, 2 / 6 ** 0.5, places=5)
+
+    def test_runs_continue_from_the_last_cutoff(self):
+        # no contribution has a neighbour yet, so nothing is stored
+        self.enroll(self.students[0], self.algorithms)
+        self.enroll(self.students[1], self.databases)
+        self.assertEqual(refresh_recommendations(), 2)
+        self.assertFalse(ContributionRecommendation.objects.exists())
+        self.assertEqual(refresh_recommendations(), 0)
+
+        self.enroll(self.students[3], self.algorithms, self.databases)
+        self.assertEqual(refresh_recommendations(), 2)
+        self.assertEqual(self.titles(self.algorithms), ['Databases'])
+        self.assertEqual(refresh_recommendations(), 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, HTTP_CACHE_MAX_AGE=60)
+class ConditionalGetTests(TestCase):
+    list_url = '/api/contributions/all-contributions/'
+
+    def setUp(self):
+        cache.clear()
+        self.contribution = Contributions.objects.create(title='Operating Systems', active=True)
+        self.detail_url = f'/api/contributions/{self.contribution.pk}/'
+
+    def test_list_is_not_modified_until_a_contribution_changes(self):
+        first = self.client.get(self.list_url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Contributions.objects.create(title='Compilers', active=True)
+        changed = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_list_validators_roll_over_together(self):
+        now = time.time()
+        with mock.patch('contributions.views.time.time', return_value=now):
+            first = self.client.get(self.list_url)
+            self.assertEqual(self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        # counters may have changed without a save; If-Modified-Since alone must not keep the old page
+        with mock.patch('contributions.views.time.time', return_value=now + 61):
+            later = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(later.status_code, 200)
+        self.assertNotEqual(later['ETag'], first['ETag'])
+        self.assertGreater(parse_http_date(later['Last-Modified']), parse_http_date(first['Last-Modified']))
+
+    def test_detail_changes_with_its_videos(self):
+        first = self.client.get(self.detail_url)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ContributionVideos.objects.create(contribution=self.contribution, title='Scheduling')
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        missing = self.client.get('/api/contributions/00000000-0000-0000-0000-000000000000/')
+        self.assertFalse(missing.has_header('ETag'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CursorFeedTests(TestCase):
+    url = '/api/contributions/all-contributions/'
+
+    def setUp(self):
+        cache.clear()
+        self.north = University.objects.create(name='North University')
+        start = timezone.now() - timedelta(hours=1)
+        self.feed = []
+        for n in range(5):
+            contribution = Contributions.objects.create(
+                title=f'Course {n}', active=True, related_University=self.north if n % 2 else None,
+            )
+            # the first two share a timestamp, so the id has to break the tie
+            Contributions.objects.filter(pk=contribution.pk).update(created_at=start + timedelta(minutes=max(n, 1)))
+            self.feed.append(contribution)
+        Contributions.objects.create(title='Hidden', active=False)
+
+    def walk(self, params):
+        page = self.client.get(self.url, {'pagination': 'cursor', **params}).json()
+        titles, counts = [], []
+        while True:
+            titles += [row['title'] for row in page['results']]
+            counts.append(page.get('count'))
+            if not page['next']:
+                return titles, counts
+            page = self.client.get(page['next']).json()
+
+    def test_pages_follow_created_at_then_id(self):
+        titles, counts = self.walk({'page_size': 2})
+
+        tied = sorted(self.feed[:2], key=lambda contribution: contribution.pk)
+        self.assertEqual(titles, ['Course 4', 'Course 3', 'Course 2', *(c.title for c in tied)])
+        self.assertEqual(counts, [None, None, None])
+
+    def test_count_only_when_asked(self):
+        _titles, counts = self.walk({'page_size': 2, 'with_count': 'true'})
+        self.assertEqual(counts, [5, 5, 5])
+
+    def test_filters_apply_to_the_pages(self):
+        titles, _counts = self.walk({'page_size': 1, 'university': self.north.pk})
+        self.assertEqual(titles, ['Course 3', 'Course 1'])
+
+    def test_page_numbers_stay_the_default(self):
+        body = self.client.get(self.url).json()
+        self.assertEqual(body['count'], 5)
+        self.assertEqual(len(body['results']), 5)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class StreamedListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.university = University.objects.create(name='North University')
+        self.student = User.objects.create(username='student', email='student@example.com', university=self.university)
+        for n in range(5):
+            Contributions.objects.create(title=f'Course {n}', active=True, related_University=self.university, user=self.student)
+        Contributions.objects.create(title='Elsewhere', active=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(self.student).access_token}')
+
+    def streamed(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_stream_matches_the_full_response(self):
+        for url in ('/api/contributions/personalized/', '/api/contributions/user/'):
+            with self.subTest(url=url):
+                full = self.client.get(url).json()
+                streamed = self.streamed(self.client.get(url, {'stream': 'true'}))
+
+                self.assertEqual(streamed['message'], full['message'])
+                self.assertEqual(sorted(row['title'] for row in streamed['data']), [f'Course {n}' for n in range(5)])
+                self.assertEqual(sorted(streamed['data'], key=lambda row: row['id']), sorted(full['data'], key=lambda row: row['id']))
+
+    def test_chunks_do_not_drop_or_repeat_rows(self):
+        queryset = apply_query_plan(Contributions.objects.order_by('title'), BasicContributionsSerializer)
+        for chunk_size in (1, 2, 5, 10):
+            with self.subTest(chunk_size=chunk_size):
+                body = self.streamed(stream_json_response(queryset, BasicContributionsSerializer, 'ok', chunk_size=chunk_size))
+                self.assertEqual([row['title'] for row in body['data']], [*(f'Course {n}' for n in range(5)), 'Elsewhere'])
+
+    def test_empty_stream_is_valid_json(self):
+        body = self.streamed(stream_json_response(Contributions.objects.none(), BasicContributionsSerializer, 'none'))
+        self.assertEqual(body, {'message': 'none', 'data': []})
+
+    def test_cursor_pages(self):
+        page = self.client.get('/api/contributions/personalized/', {'pagination': 'cursor', 'page_size': 2}).json()
+        titles = []
+        while True:
+            titles += [row['title'] for row in page['results']]
+            if not page['next']:
+                break
+            page = self.client.get(page['next']).json()
+        self.assertEqual(sorted(titles), [f'Course {n}' for n in range(5)])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ResponseCacheTests(TestCase):
+    url = '/api/contributions/all-contributions/'
+
+    def setUp(self):
+        cache.clear()
+        self.contribution = Contributions.objects.create(title='Graphics', active=True)
+
+    def test_anonymous_reads_are_served_from_the_cache(self):
+        first = self.client.get(self.url, {'page_size': 5, 'course_code': ''})
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            # same normalized query: empty values and parameter order do not matter
+            hit = self.client.get(f'{self.url}?page_size=5')
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit.content, first.content)
+        self.assertEqual(hit['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(self.url, {'page_size': 6})['X-Cache'], 'MISS')
+
+    def test_committed_changes_invalidate(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contribution.delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_detail_scope_is_per_contribution(self):
+        other = Contributions.objects.create(title='Vision', active=True)
+        self.client.get(f'/api/contributions/{self.contribution.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            ContributionVideos.objects.create(contribution=other, title='Filters')
+
+        self.assertEqual(self.client.get(f'/api/contributions/{self.contribution.pk}/')['X-Cache'], 'HIT')
+
+    def test_authenticated_reads_bypass_the_cache(self):
+        user = make_users(1)[0]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(user).access_token}')
+        self.client.get(self.url)
+
+        self.assertFalse(client.get(self.url).has_header('X-Cache'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BulkImportTests(TestCase):
+    url = '/api/contributions/bulk-import/'
+
+    def setUp(self):
+        self.creator = make_users(1)[0]
+        self.university = University.objects.create(name='North University')
+        self.department = Department.objects.create(name='Physics')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(self.creator).access_token}')
+
+    def results(self, response):
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_valid_rows_are_imported_and_invalid_ones_reported(self):
+        response = self.client.post(self.url, [
+            {'ref': 'mechanics', 'title': 'Mechanics', 'related_University': str(self.university.pk),
+             'department': str(self.department.pk), 'price': '9.50',
+             'videos': [{'title': 'Newton', 'video_file': 'https://videos.example.com/newton.mp4'}],
+             'notes': [{'title': 'Sheet', 'note_file': 'https://notes.example.com/sheet.pdf'}]},
+            {'ref': 'lost', 'title': 'Optics', 'related_University': '00000000-0000-0000-0000-000000000000'},
+            {'ref': 'untitled'},
+        ], format='json')
+
+        results = self.results(response)
+        self.assertEqual([result.get('status') for result in results[:3]], ['created', 'invalid', 'invalid'])
+        self.assertIn('related_University', results[1]['errors'])
+        self.assertIn('title', results[2]['errors'])
+        self.assertEqual(results[-1], {'summary': {'created': 1, 'invalid': 2, 'failed': 0, 'videos': 1, 'notes': 1}})
+
+        contribution = Contributions.objects.get()
+        self.assertEqual((contribution.title, contribution.user, contribution.price), ('Mechanics', self.creator, Decimal('9.50')))
+        self.assertEqual(contribution.department, self.department)
+        self.assertEqual(list(contribution.contributionVideos.values_list('title', flat=True)), ['Newton'])
+        self.assertTrue(ContributionNotes.objects.filter(contribution=contribution, title='Sheet').exists())
+
+    def test_csv_rows_attach_to_their_contribution(self):
+        manifest = (
+            'ref,kind,title,course_code,file\n'
+            'a,contribution,Thermodynamics,PHY 210,\n'
+            'a,video,Entropy,,https://videos.example.com/entropy.mp4\n'
+            'b,contribution,Relativity,,\n'
+            'a,note,Tables,,https://notes.example.com/tables.pdf\n'
+        )
+        upload = SimpleUploadedFile('manifest.csv', manifest.encode(), content_type='text/csv')
+
+        results = self.results(self.client.post(self.url, {'manifest': upload}, format='multipart'))
+        self.assertEqual(results[-1]['summary'], {'created': 2, 'invalid': 0, 'failed': 0, 'videos': 1, 'notes': 1})
+        thermodynamics = Contributions.objects.get(title='Thermodynamics')
+        self.assertEqual(thermodynamics.course_code, 'PHY 210')
+        self.assertEqual((thermodynamics.contributionVideos.count(), thermodynamics.contributionNotes.count()), (1, 1))
+
+    def test_validation_cost_does_not_grow_with_rows(self):
+        entries = [
+            {'title': f'Course {n}', 'related_University': str(self.university.pk), 'department': str(self.department.pk)}
+            for n in range(20)
+        ]
+        with self.assertNumQueries(2):
+            checked = validate_manifest(entries)
+        self.assertTrue(all(errors is None for _index, _ref, _data, errors in checked))
+
+    @override_settings(BULK_IMPORT_MAX_CONTRIBUTIONS=2)
+    def test_oversized_manifests_are_refused(self):
+        response = self.client.post(self.url, [{'title': f'Course {n}'} for n in range(3)], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Contributions.objects.exists())
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.students = make_users(2)
+        self.contribution = Contributions.objects.create(title='Robotics', active=True)
+
+    def counters(self):
+        return Contributions.objects.values_list('comment_count', 'enrollment_count').get(pk=self.contribution.pk)
+
+    def test_signals_keep_the_counters(self):
+        comment = ContributionsComments.objects.create(contribution=self.contribution, user=self.students[0], comment='Great')
+        ContributionsComments.objects.create(contribution=self.contribution, user=self.students[1], comment='Thanks')
+        for student in self.students:
+            Enrollement.objects.create(user=student, contribution=self.contribution)
+        self.assertEqual(self.counters(), (2, 2))
+
+        comment.delete()
+        Enrollement.objects.filter(user=self.students[0]).delete()
+        self.assertEqual(self.counters(), (1, 1))
+
+    def test_counters_stop_at_zero(self):
+        bump_counter(self.contribution.pk, 'comment_count', -1)
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_deleting_the_contribution_cascades(self):
+        ContributionsComments.objects.create(contribution=self.contribution, user=self.students[0], comment='Great')
+        Enrollement.objects.create(user=self.students[0], contribution=self.contribution)
+
+        self.contribution.delete()
+        self.assertFalse(ContributionsComments.objects.exists())
+        self.assertFalse(Enrollement.objects.exists())
+
+    def test_reconcile_repairs_drift(self):
+        Enrollement.objects.create(user=self.students[0], contribution=self.contribution)
+        Contributions.objects.filter(pk=self.contribution.pk).update(comment_count=9, enrollment_count=0)
+
+        self.assertEqual(reconcile_counters([self.contribution.pk]), 1)
+        self.assertEqual(reconcile_counters([self.contribution.pk]), 0)
+        self.assertEqual(self.counters(), (0, 1))
+
+    def test_reconcile_command_walks_every_batch(self):
+        for n in range(3):
+            Contributions.objects.create(title=f'Course {n}', active=True)
+        Contributions.objects.update(comment_count=5)
+
+        call_command('reconcile_counters', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(set(Contributions.objects.values_list('comment_count', flat=True)), {0})
+
+
+class ImageVariantTests(TestCase):
+    image = 'image/upload/v1/samples/cat.jpg'
+    card = 'https://res.cloudinary.com/demo/image/upload/c_fill,g_auto,h_270,q_auto,w_480/v1/samples/cat.jpg'
+
+    def setUp(self):
+        cache.clear()
+        self.author = make_users(1)[0]
+        self.contribution = Contributions.objects.create(title='Vision', active=True, user=self.author, thumbnail_image=self.image)
+
+    def card_fields(self):
+        contribution = Contributions.objects.get(pk=self.contribution.pk)
+        data = BasicContributionsSerializer(contribution).data
+        return data['thumbnail_image'], data['thumbnail_webp']
+
+    def test_variants_are_stored_on_save(self):
+        self.assertEqual(self.contribution.thumbnail_card_url, self.card)
+        self.assertTrue(self.contribution.thumbnail_webp_url.endswith('/v1/samples/cat.webp'))
+        self.assertIn('w_1280', self.contribution.thumbnail_detail_url)
+        self.assertEqual(self.card_fields(), (self.card, self.contribution.thumbnail_webp_url))
+
+    def test_rows_without_stored_urls_build_them(self):
+        # not reached by the backfill yet
+        Contributions.objects.filter(pk=self.contribution.pk).update(thumbnail_card_url=None, thumbnail_webp_url=None)
+        self.assertEqual(self.card_fields(), (self.card, self.contribution.thumbnail_webp_url))
+
+    def test_no_image_no_url(self):
+        Contributions.objects.filter(pk=self.contribution.pk).update(thumbnail_image=None, thumbnail_card_url=None, thumbnail_webp_url=None)
+        self.assertEqual(self.card_fields(), (None, None))
+
+    def test_saving_other_fields_keeps_the_variants(self):
+        self.contribution.title = 'Computer Vision'
+        self.contribution.save(update_fields=['title'])
+        self.assertEqual(Contributions.objects.get(pk=self.contribution.pk).thumbnail_card_url, self.card)
+
+    def test_new_avatar_replaces_cached_author_images(self):
+        scopes = ('contributions', f'contribution:{self.contribution.pk}')
+        before = current_versions(scopes)
+
+        self.author.profile_picture = 'image/upload/v2/samples/people/smiling-man.jpg'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertIn('g_face', self.author.avatar_url)
+        after = current_versions(scopes)
+        self.assertTrue(all(old != new for old, new in zip(before, after)))
+
+        # a save that leaves the avatar alone bumps nothing
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save(update_fields=['first_name'])
+        self.assertEqual(current_versions(scopes), after)
@@ -0,0 +1,208 @@
+"""
+Time-decayed trending scores.
+
+Every engagement event (unique video view, enrollment, rating) adds a weight
+that halves every TRENDING_HALF_LIFE_HOURS. Instead of decaying all rows on
+each run, a contribution stores the log of its score expressed at a fixed
+epoch:
+
+    log_score = log(sum(weight * exp(rate * (event_time - EPOCH))))
+
+Decay multiplies every score by the same factor, so ordering by log_score
+is the trending order at any moment, and a refresh only touches the
+contributions that received new events: their new events are aggregated
+with numpy (grouped log-sum-exp) and merged with np.logaddexp. Working in
+log space keeps the growing exponent from ever overflowing.
+
+A vote counts once, at the time it was cast, with the stars it has when it
+is first folded in; changing a vote later does not add to the score again.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.response_cache import bump_versions
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_WEIGHTS = {'view': 1.0, 'enrollment': 5.0, 'rating': 3.0}
+WRITE_BATCH_SIZE = 1000
+# pg_advisory_xact_lock key serializing concurrent refreshes
+LOCK_KEY = 0x6b6c7401
+
+
+def decay_rate():
+    """
+    Per-hour decay constant.
+    """
+    return math.log(2) / getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48)
+
+
+def _weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, 'TRENDING_WEIGHTS', {})}
+
+
+def _hours_since_epoch(moment):
+    return (moment - EPOCH).total_seconds() / 3600
+
+
+def current_score(log_score, now=None):
+    """
+    The decayed score at `now` for a stored log_score.
+    """
+    if log_score is None:
+        return 0.0
+    return math.exp(log_score - decay_rate() * _hours_since_epoch(now or timezone.now()))
+
+
+def event_sources(since, until):
+    """
+    (kind, queryset of (contribution_id, timestamp[, stars])) per event type.
+    """
+    from enrollment.models import ContributionVideoViewCount, Enrollement
+    from .models import ContributionRatings
+
+    def window(queryset, field):
+        if since is not None:
+            queryset = queryset.filter(**{f'{field}__gt': since})
+        return queryset.filter(**{f'{field}__lte': until}).order_by()
+
+    return [
+        ('view', window(ContributionVideoViewCount.objects.all(), 'viewed_at').values_list('video__contribution_id', 'viewed_at')),
+        ('enrollment', window(Enrollement.objects.all(), 'enrolled_at').values_list('contribution_id', 'enrolled_at')),
+        # a vote counts in proportion to its stars
+        ('rating', window(ContributionRatings.objects.filter(rating__gt=0), 'created_at').values_list('contribution_id', 'created_at', 'rating')),
+    ]
+
+
+def grouped_logsumexp(codes, log_weights, size):
+    """
+    log(sum(exp(log_weights))) per group code, computed stably.
+    """
+    peak = np.full(size, -np.inf)
+    np.maximum.at(peak, codes, log_weights)
+    total = np.bincount(codes, weights=np.exp(log_weights - peak[codes]), minlength=size)
+    return peak + np.log(total)
+
+
+def _chunks(queryset, chunk_size):
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def collect_event_scores(since, until, chunk_size=10000):
+    """
+    {contribution_id: log score of the events in (since, until]}.
+    """
+    rate = decay_rate()
+    weights = _weights()
+    scores = {}
+    for kind, queryset in event_sources(since, until):
+        if weights[kind] <= 0:
+            continue
+        base = math.log(weights[kind])
+        for chunk in _chunks(queryset, chunk_size):
+            chunk = [row for row in chunk if row[0] is not None]
+            if not chunk:
+                continue
+            ids, codes = np.unique(np.array([str(row[0]) for row in chunk]), return_inverse=True)
+            hours = np.fromiter(((row[1] - EPOCH).total_seconds() / 3600 for row in chunk), dtype=float, count=len(chunk))
+            log_weights = base + rate * hours
+            if kind == 'rating':
+                stars = np.fromiter((float(row[2]) for row in chunk), dtype=float, count=len(chunk))
+                log_weights = log_weights + np.log(np.minimum(stars, 5) / 5)
+            grouped = grouped_logsumexp(codes.ravel(), log_weights, len(ids))
+            for contribution_id, value in zip(ids.tolist(), grouped.tolist()):
+                scores[contribution_id] = float(np.logaddexp(scores.get(contribution_id, -np.inf), value))
+    return scores
+
+
+def _write_scores(scores, computed_at, replace):
+    from .models import Contributions, ContributionTrending
+
+    ids = list(scores)
+    written = 0
+    for start in range(0, len(ids), WRITE_BATCH_SIZE):
+        batch = ids[start:start + WRITE_BATCH_SIZE]
+        contributions = {
+            str(pk): (active, university_id, department_id)
+            for pk, active, university_id, department_id in Contributions.objects.filter(pk__in=batch)
+            .values_list('pk', 'active', 'related_University_id', 'department_id')
+        }
+        batch = [pk for pk in batch if pk in contributions]
+        new = np.array([scores[pk] for pk in batch], dtype=float)
+        if not replace:
+            stored = {
+                str(pk): value for pk, value in ContributionTrending.objects.filter(contribution_id__in=batch)
+                .values_list('contribution_id', 'log_score')
+            }
+            old = np.array([stored.get(pk, -np.inf) for pk in batch], dtype=float)
+            new = np.logaddexp(old, new)
+        rows = [
+            ContributionTrending(
+                contribution_id=pk,
+                log_score=value,
+                active=contributions[pk][0],
+                university_id=contributions[pk][1],
+                department_id=contributions[pk][2],
+                computed_at=computed_at,
+            )
+            for pk, value in zip(batch, new.tolist())
+        ]
+        ContributionTrending.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['contribution'],
+            update_fields=['log_score', 'active', 'university', 'department', 'computed_at'],
+        )
+        written += len(rows)
+    return written
+
+
+def refresh_trending(rebuild=False, chunk_size=10000):
+    """
+    Fold the events since the last run into the stored scores (all events with rebuild=True).
+    Returns the number of contributions written.
+    """
+    from .models import ContributionTrending
+
+    with transaction.atomic():
+        # two overlapping runs would read the same `since` and add the same events twice
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_KEY])
+
+        # events are stamped before their transaction commits; leave a margin so none is skipped
+        until = timezone.now() - timedelta(seconds=getattr(settings, 'TRENDING_COMMIT_LAG_SECONDS', 60))
+        since = None if rebuild else ContributionTrending.objects.aggregate(last=Max('computed_at'))['last']
+        scores = collect_event_scores(since, until, chunk_size)
+        if rebuild:
+            ContributionTrending.objects.all().delete()
+        written = _write_scores(scores, until, replace=rebuild or since is None)
+    if written or rebuild:
+        bump_versions('trending')
+    return written
+
+
+def sync_trending_filters(contribution):
+    """
+    Copy a contribution's active flag, university and department to its trending row.
+    """
+    from .models import ContributionTrending
+
+    ContributionTrending.objects.filter(contribution_id=contribution.pk).update(
+        active=contribution.active,
+        university_id=contribution.related_University_id,
+        department_id=contribution.department_id,
+    )
@@ -1,14 +1,18 @@
 from django.contrib import admin
 from django.urls import path
 
-from .views import ContributionsListView, ContributionDetailView, ContributionsView, PersonalizedContributionsView, UserContributionsView,UserContributionDetailView,ContributionVideoCreateView,ContributionNotesCreateView,ContributionCommentsView,ContributionCommentCreateView,RateContributionView
+from .views import ContributionsListView, ContributionDetailView, ContributionsView, PersonalizedContributionsView, UserContributionsView,UserContributionDetailView,ContributionVideoCreateView,ContributionNotesCreateView,ContributionCommentsView,ContributionCommentCreateView,RateContributionView,CourseCodeSuggestView,BulkImportContributionsView,TrendingContributionsView,ContributionRecommendationsView
 
 
 
 urlpatterns = [
     path("all-contributions/", ContributionsListView.as_view(), name="contributions-list"),
+    path("trending/", TrendingContributionsView.as_view(), name="contributions-trending"),
+    path("course-codes/suggest/", CourseCodeSuggestView.as_view(), name="course-code-suggest"),
     path("<uuid:id>/", ContributionDetailView.as_view(), name="contributions-detail"),
+    path("<uuid:id>/recommendations/", ContributionRecommendationsView.as_view(), name="contribution-recommendations"),
     path("create/", ContributionsView.as_view(), name="create-contribution"),
+    path("bulk-import/", BulkImportContributionsView.as_view(), name="bulk-import-contributions"),
     path("<uuid:contribution_id>/edit/", ContributionsView.as_view(), name="edit-contribution"),
     path("<uuid:contribution_id>/delete/", ContributionsView.as_view(), name="delete-contribution"),
     path("<uuid:contribution_id>/videos/", ContributionVideoCreateView.as_view(), name="contribution-video-create"),
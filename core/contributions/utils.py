@@ -1,6 +1,115 @@
-from rest_framework.pagination import PageNumberPagination
+
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_CHUNK_SIZE = 500
 
 class CustomPagination(PageNumberPagination):
     page_size = 10  # default
     page_size_query_param = "page_size"  # allow client to override
     max_page_size = 100
+
+
+class ContributionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (-created_at, id), so every page is an index range scan
+    on the (active, <filter>, -created_at) indexes instead of OFFSET + COUNT(*).
+    The total count is only computed when asked for with ?with_count=true.
+    """
+    page_size = 15
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ('-created_at', 'id')
+    count_query_param = "with_count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total_count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.total_count = queryset.order_by().count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.total_count is not None:
+            response.data['count'] = self.total_count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return schema
+
+
+class CommentCursorPagination(CursorPagination):
+    """
+    Keyset pagination of one contribution's comments, newest first, over the
+    (contribution, -created_at) index. The view sets `total_count` from the
+    contribution's maintained comment_count instead of counting rows.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ('-created_at',)
+    total_count = None
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.total_count is not None:
+            response.data['count'] = self.total_count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return schema
+
+
+class TrendingCursorPagination(CursorPagination):
+    """
+    Keyset pagination by trending score (the `trending_log_score` annotation),
+    ties broken by id so that equal scores keep a stable order across pages.
+    """
+    page_size = 15
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ('-trending_log_score', '-pk')
+
+
+def wants_cursor_pagination(request):
+    """
+    Cursor mode is opt-in: ?pagination=cursor, or any request that carries a cursor.
+    """
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def stream_json_response(queryset, serializer_class, message, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream {"message": ..., "data": [...]} while walking the queryset with a
+    server-side cursor, serializing chunk_size rows at a time. Worker memory
+    stays flat however many rows match.
+    """
+    def generate():
+        yield '{"message": %s, "data": [' % json.dumps(message)
+        separator = ''
+        batch = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            batch.append(obj)
+            if len(batch) == chunk_size:
+                for item in serializer_class(batch, many=True).data:
+                    yield separator + json.dumps(item, cls=JSONEncoder)
+                    separator = ','
+                batch = []
+        for item in serializer_class(batch, many=True).data:
+            yield separator + json.dumps(item, cls=JSONEncoder)
+            separator = ','
+        yield ']}'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
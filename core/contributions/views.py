@@ -11,21 +11,71 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from .models import Contributions, ContributionVideos, ContributionNotes, ContributionsComments, ContributionRatings
 from .serializers import (BasicContributionsSerializer, ContributionsSerializer, ContributionVideosSerializer, ContributionDetailSerializer,
-                          ContributionNotesSerializer, ContributionsCommentsSerializer, ContributionRatingsSerializer, BasicContributionsSerializer, CreateContributionsSerializer,UserContributionsSerializer)  
+                          ContributionNotesSerializer, ContributionsCommentsSerializer, ContributionRatingsSerializer, BasicContributionsSerializer, CreateContributionsSerializer,UserContributionsSerializer,
+                          SearchContributionsSerializer, CommentListSerializer, TrendingContributionsSerializer,
+                          RecommendedContributionsSerializer)
+from .utils import ContributionCursorPagination, CommentCursorPagination, TrendingCursorPagination, wants_cursor_pagination, wants_stream, stream_json_response
+from .ratings import submit_rating
+from .bulk_import import ManifestError, check_manifest_size, parse_manifest, run_import, ndjson_lines
+from .search import search_contributions, fuzzy_contributions, normalize_course_code, suggest_course_codes
 
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.db.models import Q, Max, Count, F, IntegerField, OuterRef, Subquery
+from django.conf import settings
+import time
+from datetime import datetime, timezone as dt_timezone
+from core.query_planning import apply_query_plan
+from core.response_cache import CachedResponseMixin, current_versions
+from core.conditional import ConditionalGetMixin, make_etag, version_to_datetime
+from accounts.authentication import ClaimsJWTAuthentication
 
 
 
-class ContributionsListView(ListAPIView):
+class ContributionsListView(ConditionalGetMixin, CachedResponseMixin, ListAPIView):
     """
     API endpoint to list all contributions with pagination.
+    ?pagination=cursor switches the feed to keyset pagination (newest first, no count
+    unless ?with_count=true). Ranked search and fuzzy results keep page numbers,
+    since relevance has no stable cursor key.
     """
 
     permission_classes = [permissions.AllowAny]
     serializer_class = BasicContributionsSerializer
+    cache_scopes = ('contributions',)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if wants_cursor_pagination(self.request) and not (params.get('search') or params.get('fuzzy')):
+                self._paginator = ContributionCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        The contributions version stamp, bumped after every committed save or
+        delete, so no query is needed. View and rating counters change without
+        a save, so the ETag also rolls over every HTTP_CACHE_MAX_AGE seconds, and
+        Last-Modified is never older than the start of the current window.
+        """
+        version = current_versions(('contributions',))[0]
+        window_seconds = max(settings.HTTP_CACHE_MAX_AGE, 1)
+        window = int(time.time() // window_seconds)
+        window_start = datetime.fromtimestamp(window * window_seconds, tz=dt_timezone.utc)
+        last_modified = max(version_to_datetime(version), window_start)
+        return make_etag(request.get_full_path(), version, window), last_modified
+
+    def highlight_requested(self):
+        return bool(self.request.query_params.get('search')) and self.request.query_params.get('highlight') in ('1', 'true')
+
+    def get_serializer_class(self):
+        if self.highlight_requested():
+            return SearchContributionsSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         """
@@ -33,32 +83,81 @@ class ContributionsListView(ListAPIView):
         /?university=1&department=2&course_code=CS101
         /?university=1&department=2
         /?course_code=CS101
+        /?search=data structures&highlight=true  (ranked full-text search)
+        /?fuzzy=cs220  (typo tolerant course code / title match)
 
         """
-        queryset = Contributions.objects.filter(active=True).select_related('related_University', 'department').prefetch_related ('comments', 'contribution_ratings')
+        queryset = Contributions.objects.filter(active=True)
         university_id = self.request.query_params.get('university')
         department_id = self.request.query_params.get('department')
         course_code = self.request.query_params.get('course_code')
         search = self.request.query_params.get('search')
+        fuzzy = self.request.query_params.get('fuzzy')
 
         if university_id:
             queryset = queryset.filter(related_University__id=university_id)
         if department_id:
             queryset = queryset.filter(department__id=department_id)
         if course_code:
-            queryset = queryset.filter(course_code__iexact=course_code)
-        # for search results
+            normalized = normalize_course_code(course_code)
+            # a code of nothing but separators ("---") matches no contribution, not the ones without a code
+            queryset = queryset.filter(course_code_normalized=normalized) if normalized else queryset.none()
+        # for search results, ranked by relevance
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(course_code__icontains=search) |
-                Q(description__icontains=search)
-            )
-        return queryset
+            queryset = search_contributions(queryset, search, highlight=self.highlight_requested())
+        elif fuzzy:
+            queryset = fuzzy_contributions(queryset, fuzzy)
+        return apply_query_plan(queryset, self.get_serializer_class())
+
+
+
+class CourseCodeSuggestView(APIView):
+    """
+    "Did you mean" for course codes: closest known codes for ?q=, optionally within ?university=
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        term = request.query_params.get('q', '')
+        university_id = request.query_params.get('university')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 5)), 20))
+        except ValueError:
+            limit = 5
+
+        queryset = Contributions.objects.filter(active=True)
+        if university_id:
+            queryset = queryset.filter(related_University__id=university_id)
+        suggestions = suggest_course_codes(queryset, term, limit=limit)
+        return Response({"message": "Suggestions retrieved successfully", "data": suggestions}, status=status.HTTP_200_OK)
+
+
+
+class TrendingContributionsView(CachedResponseMixin, ListAPIView):
+    """
+    Active contributions by trending score, optionally scoped:
+    /trending/?university=<id>  or  /trending/?department=<id>
+    Keyset-paginated; each page is a range scan of a ContributionTrending index.
+    Scores are refreshed by `manage.py refresh_trending`.
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = TrendingContributionsSerializer
+    pagination_class = TrendingCursorPagination
+    cache_scopes = ('contributions', 'trending')
 
+    def get_queryset(self):
+        filters = {'trending__active': True}
+        university_id = self.request.query_params.get('university')
+        department_id = self.request.query_params.get('department')
+        if university_id:
+            filters['trending__university_id'] = university_id
+        if department_id:
+            filters['trending__department_id'] = department_id
+        queryset = Contributions.objects.filter(**filters).annotate(trending_log_score=F('trending__log_score'))
+        return apply_query_plan(queryset, TrendingContributionsSerializer)
 
 
-class ContributionDetailView(RetrieveAPIView):
+class ContributionDetailView(ConditionalGetMixin, CachedResponseMixin, RetrieveAPIView):
     """
     get the single contribution with details and also video
     notes and video will only contain title
@@ -66,16 +165,58 @@ class ContributionDetailView(RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
 
     serializer_class = ContributionDetailSerializer
-    queryset = Contributions.objects.filter(active=True).prefetch_related(
-        'contributionVideos',
-        'contributionNotes'
-    ).select_related(
-        'user',
-        'related_University',
-        'department'
-    )
     lookup_field = 'id'
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        return (f"contribution:{kwargs['id']}",)
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        The contribution's own timestamp and counters, the author's avatar and its
+        newest video/note (the counts catch deleted children). Each child table is read by its own
+        subquery; joining both would multiply videos by notes.
+        """
+        videos = ContributionVideos.objects.filter(contribution_id=OuterRef('pk')).order_by().values('contribution_id')
+        notes = ContributionNotes.objects.filter(contribution_id=OuterRef('pk')).order_by().values('contribution_id')
+        row = (
+            Contributions.objects.filter(id=kwargs['id'], active=True)
+            .values('updated_at', 'total_views', 'ratings', 'rating_count', 'user__avatar_url')
+            .annotate(
+                videos_at=Subquery(videos.annotate(at=Max('updated_at')).values('at')),
+                videos=Subquery(videos.annotate(n=Count('pk')).values('n'), output_field=IntegerField()),
+                notes_at=Subquery(notes.annotate(at=Max('updated_at')).values('at')),
+                notes=Subquery(notes.annotate(n=Count('pk')).values('n'), output_field=IntegerField()),
+            )
+            .first()
+        )
+        if row is None:
+            return None, None
+        last_modified = max(filter(None, [row['updated_at'], row['videos_at'], row['notes_at']]))
+        return make_etag(kwargs['id'], *row.values()), last_modified
+
+    def get_queryset(self):
+        return apply_query_plan(Contributions.objects.filter(active=True), self.get_serializer_class())
+
+
+class ContributionRecommendationsView(CachedResponseMixin, APIView):
+    """
+    "Students who enrolled in this also took": the stored top-K neighbours of a
+    contribution, best first, in one lookup on (contribution, rank).
+    Built by `manage.py refresh_recommendations`.
+    """
+    permission_classes = [permissions.AllowAny]
+    cache_scopes = ('contributions', 'recommendations')
+
+    def get(self, request, id):
+        contributions = apply_query_plan(
+            Contributions.objects.filter(recommended_for__contribution_id=id, active=True)
+            .annotate(similarity=F('recommended_for__score'))
+            .order_by('recommended_for__rank'),
+            RecommendedContributionsSerializer,
+        )
+        serializer = RecommendedContributionsSerializer(contributions, many=True)
+        return Response({"message": "Recommendations retrieved successfully", "data": serializer.data}, status=status.HTTP_200_OK)
+
 
     
 class ContributionsView(APIView):
@@ -200,22 +341,68 @@ class ContributionNotesCreateView(APIView):
 
 
 
+class BulkImportContributionsView(APIView):
+    """
+    Import many contributions with their videos and notes in one request.
+    Accepts a JSON/CSV manifest upload (`manifest`) or a JSON body, see
+    contributions/bulk_import.py for the format. Streams one NDJSON result
+    line per contribution and a final summary line.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get('manifest')
+        try:
+            if upload is not None:
+                fmt = 'csv' if upload.name.lower().endswith('.csv') else None
+                entries = parse_manifest(upload.read(), fmt)
+            else:
+                data = request.data
+                entries = data if isinstance(data, list) else data.get('contributions')
+                if not isinstance(entries, list):
+                    raise ManifestError("Send a `manifest` file or a list of contributions.")
+                check_manifest_size(entries)
+        except ManifestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return StreamingHttpResponse(ndjson_lines(run_import(request.user, entries)), content_type='application/x-ndjson')
+
+
+def bounded_contributions_response(request, view, contributions, message):
+    """
+    Default: the full list in one response.
+    ?pagination=cursor: keyset pages of BasicContributionsSerializer cards.
+    ?stream=true: the full list streamed in chunks.
+    """
+    if wants_stream(request):
+        return stream_json_response(contributions, BasicContributionsSerializer, message)
+    if wants_cursor_pagination(request):
+        paginator = ContributionCursorPagination()
+        page = paginator.paginate_queryset(contributions, request, view=view)
+        serializer = BasicContributionsSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    serializer = BasicContributionsSerializer(contributions, many=True)
+    return Response({"message": message, "data": serializer.data}, status=status.HTTP_200_OK)
+
+
 class PersonalizedContributionsView(APIView):
     """
     fetch contributions filtered by user university
+    supports ?pagination=cursor and ?stream=true for large universities
+    the university comes from the token claims
     """
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         user = request.user
         try:
-            user_university = user.university
-            if not user_university:
+            user_university_id = user.university_id
+            if not user_university_id:
                 return Response({"error": "User does not have an associated university."}, status=status.HTTP_400_BAD_REQUEST)
 
-            contributions = Contributions.objects.filter(related_University=user_university, active=True).select_related('related_University', 'department').prefetch_related('comments', 'contribution_ratings')
-            serializer = BasicContributionsSerializer(contributions, many=True)
-            return Response({"message": "Personalized contributions retrieved successfully", "data": serializer.data}, status=status.HTTP_200_OK)
+            contributions = apply_query_plan(Contributions.objects.filter(related_University_id=user_university_id, active=True), BasicContributionsSerializer)
+            return bounded_contributions_response(request, self, contributions, "Personalized contributions retrieved successfully")
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
@@ -225,14 +412,15 @@ class PersonalizedContributionsView(APIView):
 class UserContributionsView(APIView):
     """
      list of contributions filtered by user
+     supports ?pagination=cursor and ?stream=true for prolific creators
     """
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request):
         user = request.user
         try:
-            contributions = Contributions.objects.filter(user=user).select_related('related_University', 'department').prefetch_related( 'comments', 'contribution_ratings')
-            serializer = BasicContributionsSerializer(contributions, many=True)
-            return Response({"message": "Personalized contributions retrieved successfully", "data": serializer.data}, status=status.HTTP_200_OK)
+            contributions = apply_query_plan(Contributions.objects.filter(user_id=user.pk), BasicContributionsSerializer)
+            return bounded_contributions_response(request, self, contributions, "Personalized contributions retrieved successfully")
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -245,7 +433,7 @@ class UserContributionDetailView(APIView):
     def get(self, request, contribution_id):
         user = request.user
         try:
-            contribution = Contributions.objects.get(id=contribution_id, user=user)
+            contribution = apply_query_plan(Contributions.objects.all(), UserContributionsSerializer).get(id=contribution_id, user=user)
             serializer = UserContributionsSerializer(contribution)
             return Response({"message": "Contribution retrieved successfully", "data": serializer.data}, status=status.HTTP_200_OK)
         except Contributions.DoesNotExist:
@@ -256,27 +444,39 @@ class UserContributionDetailView(APIView):
 class ContributionCommentsView(APIView):
     """
     API endpoint to retrieve comments for a specific contribution.
+    ?pagination=cursor: keyset pages newest first, `count` is the contribution's maintained comment_count.
     """
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, contribution_id):
-        try:
-            Contributions.objects.only('id').get(id=contribution_id, active=True)
-        except Contributions.DoesNotExist:
+        contribution = (
+            Contributions.objects.filter(id=contribution_id, active=True)
+            .values('id', 'comment_count').first()
+        )
+        if contribution is None:
             return Response({"error": "Contribution not found"}, status=404)
 
-        comments = (
-            ContributionsComments.objects
-            .filter(contribution_id=contribution_id)
-            .select_related('user', 'contribution')
+        if not wants_cursor_pagination(request):
+            comments = apply_query_plan(
+                ContributionsComments.objects.filter(contribution_id=contribution_id),
+                ContributionsCommentsSerializer,
+            )
+            serializer = ContributionsCommentsSerializer(comments, many=True)
+            return Response({
+                "message": "Comments retrieved successfully",
+                "data": serializer.data
+            })
+
+        comments = apply_query_plan(
+            ContributionsComments.objects.filter(contribution_id=contribution_id),
+            CommentListSerializer,
         )
 
-        serializer = ContributionsCommentsSerializer(comments, many=True)
-
-        return Response({
-            "message": "Comments retrieved successfully",
-            "data": serializer.data
-        })
+        paginator = CommentCursorPagination()
+        paginator.total_count = contribution['comment_count']
+        page = paginator.paginate_queryset(comments, request, view=self)
+        serializer = CommentListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ContributionCommentCreateView(APIView):
@@ -345,24 +545,19 @@ class RateContributionView(APIView):
 
         # Fetch contribution
         try:
-            contribution = Contributions.objects.get(id=contribution_id, active=True)
+            contribution = Contributions.objects.only('id').get(id=contribution_id, active=True)
         except Contributions.DoesNotExist:
             return Response({"error": "Contribution not found"}, status=404)
 
-        # Create or update rating
-        rating_obj, created = ContributionRatings.objects.update_or_create(
-            user=request.user,
-            contribution=contribution,
-            defaults={'rating': rating_value}
-        )
-
-        # Update cached average
-        contribution.update_average_rating()
+        # Create or update rating, applying the delta to the stored aggregates
+        submit_rating(request.user, contribution, rating_value)
+        contribution.refresh_from_db(fields=['ratings', 'rating_count'])
 
         return Response({
             "message": "Rating submitted",
             "your_rating": rating_value,
-            "average_rating": contribution.ratings
+            "average_rating": contribution.ratings,
+            "rating_count": contribution.rating_count,
         })
 
 
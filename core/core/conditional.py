@@ -0,0 +1,117 @@
+"""
+HTTP validators and cache headers for read endpoints.
+
+A view implements get_validators() returning (etag, last_modified) from cheap
+queries (timestamps, version stamps). They are checked after authentication,
+permissions and throttling but before the handler runs, so a matching
+If-None-Match / If-Modified-Since is answered with 304 without serializing
+anything. 200 and 304 responses carry ETag, Last-Modified, Cache-Control and
+Vary: anonymous responses are public and may be kept by a CDN for
+`cache_max_age` seconds, authenticated ones are private and revalidated on
+every use.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class NotModified(Exception):
+    pass
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+
+def version_to_datetime(version):
+    """
+    Version stamps (core.response_cache) are nanosecond timestamps.
+    """
+    return datetime.fromtimestamp(int(version) / 1e9, tz=timezone.utc)
+
+
+def accepts_encoding(request, coding):
+    """
+    Whether Accept-Encoding allows `coding`, honouring q-values (q=0 refuses it).
+    """
+    wildcard = False
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        name = name.strip().lower()
+        if name == coding:
+            return quality > 0
+        if name == '*':
+            wildcard = quality > 0
+    return wildcard
+
+
+def is_not_modified(request, etag, last_modified):
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return response is not None and response.status_code == 304
+
+
+def set_cache_headers(request, response, etag=None, last_modified=None, max_age=None):
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if max_age is None:
+        max_age = getattr(settings, 'HTTP_CACHE_MAX_AGE', 60)
+    if 'HTTP_AUTHORIZATION' in request.META:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, ('Authorization', 'Accept'))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    APIView mixin adding validators and cache headers to GET responses.
+    """
+    cache_max_age = None
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        Return (etag, last_modified); either may be None.
+        """
+        return None, None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._etag, self._last_modified = None, None
+        if request.method in ('GET', 'HEAD'):
+            self._etag, self._last_modified = self.get_validators(request, *args, **kwargs)
+            if (self._etag or self._last_modified) and is_not_modified(request, self._etag, self._last_modified):
+                raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return HttpResponseNotModified()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            set_cache_headers(
+                request,
+                response,
+                etag=getattr(self, '_etag', None),
+                last_modified=getattr(self, '_last_modified', None),
+                max_age=self.cache_max_age,
+            )
+        return response
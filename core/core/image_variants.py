@@ -0,0 +1,92 @@
+"""
+Precomputed Cloudinary delivery URLs.
+
+Serializing a CloudinaryField builds its URL through the SDK for every row of
+every response, and always points at the full-size original. Instead, models
+store the URLs of a few resized variants next to the image, built once when
+the image is saved, and serializers return those columns as plain strings
+(VariantURLField). Rows the backfill has not reached yet have no stored URL;
+for those the same variant is built from the image on the fly.
+
+Each model lists its variants as {url column: transformation options}; the
+options are handed to CloudinaryResource.build_url(). After changing them,
+rebuild the stored URLs with `manage.py backfill_image_variants --all`.
+"""
+
+from cloudinary import CloudinaryResource
+from rest_framework import serializers
+from rest_framework.fields import get_attribute
+
+# 16:9 listing cards, the detail page header and round profile avatars
+CARD = {'width': 480, 'height': 270, 'crop': 'fill', 'gravity': 'auto', 'quality': 'auto'}
+DETAIL = {'width': 1280, 'crop': 'limit', 'quality': 'auto'}
+AVATAR = {'width': 96, 'height': 96, 'crop': 'thumb', 'gravity': 'face', 'quality': 'auto'}
+WEBP = {'format': 'webp'}
+
+THUMBNAIL_VARIANTS = {
+    'thumbnail_card_url': CARD,
+    'thumbnail_detail_url': DETAIL,
+    'thumbnail_webp_url': {**CARD, **WEBP},
+}
+AVATAR_VARIANTS = {
+    'avatar_url': AVATAR,
+    'avatar_webp_url': {**AVATAR, **WEBP},
+}
+VARIANTS = {**THUMBNAIL_VARIANTS, **AVATAR_VARIANTS}
+
+
+def variant_urls(image, variants):
+    """
+    {url column: URL} of a Cloudinary resource (None for every column without an image).
+    """
+    if not isinstance(image, CloudinaryResource) or not image.public_id:
+        return dict.fromkeys(variants)
+    return {column: image.build_url(secure=True, **options) for column, options in variants.items()}
+
+
+def refresh_image_variants(instance, field_name, variants, update_fields=None):
+    """
+    Set the variant URL columns of instance from its image before it is saved.
+    A freshly uploaded file is sent to Cloudinary first so its public id is
+    known; the field's own pre_save then finds it already uploaded.
+    Returns update_fields, extended with the URL columns when the image is part of the save.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return update_fields
+    field = instance._meta.get_field(field_name)
+    field.pre_save(instance, instance._state.adding)
+    image = field.to_python(getattr(instance, field.attname) or None)
+    for column, url in variant_urls(image, variants).items():
+        setattr(instance, column, url)
+    if update_fields is None:
+        return None
+    return {*update_fields, *variants}
+
+
+class VariantURLField(serializers.ReadOnlyField):
+    """
+    A stored variant URL column (the field's source), falling back to building
+    the variant from `image` while the column is still null.
+
+        author_image = VariantURLField(source='user.avatar_url', image='user.profile_picture')
+    """
+
+    def __init__(self, image, **kwargs):
+        self.image = image
+        super().__init__(**kwargs)
+
+    @property
+    def plan_sources(self):
+        # apply_query_plan loads the image column as well
+        return (self.source, self.image)
+
+    def get_attribute(self, instance):
+        url = super().get_attribute(instance)
+        if url:
+            return url
+        try:
+            image = get_attribute(instance, self.image.split('.'))
+        except AttributeError:
+            return None
+        column = self.source.rsplit('.', 1)[-1]
+        return variant_urls(image, {column: VARIANTS[column]})[column]
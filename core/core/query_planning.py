@@ -0,0 +1,139 @@
+"""
+Derive select_related / prefetch_related / only() for a queryset from the
+DRF serializer that will render it, so views load exactly what the
+serializer reads.
+
+    queryset = apply_query_plan(Contributions.objects.filter(active=True), BasicContributionsSerializer)
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    def __init__(self):
+        self.select_related = set()
+        self.prefetch_related = {}
+        self.only = set()
+        # relations rendered through __str__ (StringRelatedField) need the whole row
+        self.full_paths = set()
+        # False when a field reads something we cannot see (method fields, properties)
+        self.restrict = True
+
+    def only_fields(self):
+        return sorted(
+            name for name in self.only
+            if not any(name.startswith(path + '__') for path in self.full_paths)
+        )
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related.values())
+        if self.restrict:
+            queryset = queryset.only(*self.only_fields())
+        return queryset
+
+
+def _join(*parts):
+    return '__'.join(part for part in parts if part)
+
+
+def _model_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if isinstance(field, serializers.ModelSerializer):
+        return field
+    return None
+
+
+def _walk(serializer, model, prefix, plan, annotations=()):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        if field.source == '*':
+            if isinstance(field, serializers.Serializer):
+                _walk(field, model, prefix, plan)
+            else:
+                plan.restrict = False
+            continue
+
+        for source in getattr(field, 'plan_sources', (field.source,)):
+            _walk_source(field, source, model, prefix, plan, annotations)
+
+
+def _walk_source(field, source, model, prefix, plan, annotations):
+    attrs = source.split('.')
+    current_model = model
+    path = prefix
+    for index, attr in enumerate(attrs):
+        last = index == len(attrs) - 1
+        try:
+            model_field = current_model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # annotations on the outer queryset are fine, anything else is opaque
+            if not (not prefix and index == 0 and attr in annotations):
+                plan.restrict = False
+            break
+
+        field_path = _join(path, model_field.name)
+
+        if not model_field.is_relation:
+            plan.only.add(field_path)
+            break
+
+        if model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            plan.only.add(field_path)
+            if not last:
+                plan.select_related.add(field_path)
+                current_model = model_field.related_model
+                path = field_path
+                continue
+            nested = _model_serializer(field)
+            if nested is not None:
+                plan.select_related.add(field_path)
+                _walk(nested, model_field.related_model, field_path, plan)
+            elif not isinstance(field, serializers.PrimaryKeyRelatedField):
+                plan.select_related.add(field_path)
+                plan.full_paths.add(field_path)
+            break
+
+        # reverse foreign keys, reverse one-to-ones and many-to-manys
+        nested = _model_serializer(field)
+        if nested is not None and last:
+            related_model = model_field.related_model
+            child_queryset = related_model._default_manager.all()
+            child_plan = QueryPlan()
+            _walk(nested, related_model, '', child_plan)
+            if model_field.one_to_many:
+                # prefetch joins the children back on their foreign key
+                child_plan.only.add(model_field.field.name)
+            plan.prefetch_related[field_path] = Prefetch(field_path, queryset=child_plan.apply(child_queryset))
+        else:
+            plan.prefetch_related.setdefault(field_path, field_path)
+            if not last:
+                plan.restrict = False
+        break
+
+
+def plan_for_serializer(serializer_class, model=None, annotations=()):
+    serializer = serializer_class()
+    model = model or serializer.Meta.model
+    plan = QueryPlan()
+    _walk(serializer, model, '', plan, annotations=annotations)
+    return plan
+
+
+def apply_query_plan(queryset, serializer_class, also=()):
+    """
+    Plan the queryset for serializer_class. `also` lists extra columns the
+    caller reads itself (cursor pagination reads its ordering fields).
+    """
+    annotations = tuple(queryset.query.annotations)
+    plan = plan_for_serializer(serializer_class, model=queryset.model, annotations=annotations)
+    plan.only.update(also)
+    return plan.apply(queryset)
+
@@ -0,0 +1,128 @@
+"""
+Shared cache of rendered responses for anonymous GET endpoints.
+
+A view lists the entities its output depends on as scopes ("contributions",
+"contribution:<id>", "catalog"). Each scope has a version stamp in the cache;
+the response key is built from the path, the normalized query string and the
+current stamps of its scopes. Saving or deleting a model bumps the stamps of
+its scopes once the transaction commits (see the apps' signals.py), so stale
+entries are never read again and simply expire.
+
+Hits return the cached bytes directly, without touching the database or
+running serializers; only authentication and throttling run first. Validator and cache headers are stored with the bytes,
+so conditional requests are answered with 304 from the cache as well.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+VERSION_PREFIX = 'respcache:version:'
+KEY_PREFIX = 'respcache:response:'
+STORED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def _new_version():
+    return str(time.time_ns())
+
+
+def bump_versions(*scopes):
+    cache.set_many({VERSION_PREFIX + scope: _new_version() for scope in scopes}, timeout=None)
+
+
+def bump_versions_on_commit(*scopes):
+    """
+    Bump the stamps after the current transaction commits. Bumping earlier
+    lets a concurrent reader store the pre-commit rows under the new stamps.
+    """
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+def current_versions(scopes):
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def response_cache_key(request, versions):
+    query = sorted(
+        (name, tuple(sorted(values)))
+        for name, values in request.GET.lists()
+        if any(values)
+    )
+    # the browsable API and JSON render differently
+    flavour = 'html' if 'text/html' in request.META.get('HTTP_ACCEPT', '') else 'json'
+    raw = repr((request.path, query, flavour, versions))
+    return KEY_PREFIX + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def is_anonymous_get(request):
+    return request.method == 'GET' and 'HTTP_AUTHORIZATION' not in request.META
+
+
+class CachedResponseMixin:
+    """
+    APIView mixin: serve anonymous GETs from the shared response cache.
+    Set `cache_scopes` or override get_cache_scopes().
+    """
+    cache_scopes = ()
+    cache_timeout = None
+
+    def get_cache_scopes(self, request, *args, **kwargs):
+        return self.cache_scopes
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_anonymous_get(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        versions = current_versions(self.get_cache_scopes(request, *args, **kwargs))
+        key = response_cache_key(request, versions)
+        cached = cache.get(key)
+        if cached is not None:
+            # hits still count against the throttles (and permissions) of the view
+            drf_request = self.initialize_request(request, *args, **kwargs)
+            self.args, self.kwargs, self.request = args, kwargs, drf_request
+            self.headers = self.default_response_headers
+            try:
+                self.initial(drf_request, *args, **kwargs)
+            except Exception as exc:
+                response = self.handle_exception(exc)
+                return self.finalize_response(drf_request, response, *args, **kwargs)
+
+            content, content_type, headers = cached
+            last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+            conditional = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+            if conditional is not None and conditional.status_code == 304:
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(content, content_type=content_type)
+            for name, value in headers.items():
+                response[name] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render'):
+                response.render()
+            headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+            cache.set(key, (response.content, response['Content-Type'], headers), self.get_cache_timeout())
+            response['X-Cache'] = 'MISS'
+        return response
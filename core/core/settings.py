@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'rest_framework_simplejwt',
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
     'enrollment',
     'contact',
     'user_stats',
+    'outbox',
 
 ]
 
@@ -116,6 +118,62 @@ DATABASES = {
 
 
 
+# Cache
+# A shared backend (REDIS_URL) in production; process-local memory otherwise.
+# Lookup caches live in `default`. `view_buffer` holds buffered video views,
+# which exist nowhere else: point it at a Redis that does not evict keys
+# without a TTL (maxmemory-policy noeviction or volatile-*). Without Redis,
+# views are written straight to the database instead (enrollment.view_counters).
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        'view_buffer': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('VIEW_BUFFER_REDIS_URL', os.getenv('REDIS_URL')),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'klk-default',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# seconds an anonymous response stays in the shared response cache
+# (model changes invalidate it earlier through version stamps)
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+
+# Cache-Control max-age of anonymous read responses (browsers and CDNs)
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 60))
+
+# seconds a rendered catalog snapshot is kept (university.catalog)
+CATALOG_SNAPSHOT_TTL = int(os.getenv('CATALOG_SNAPSHOT_TTL', 600))
+
+# seconds between write-behind flushes of buffered video view counts
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', 30))
+VIEW_COUNTER_CACHE = 'view_buffer'
+# seconds an authenticated user stays cached (dropped on every User save)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+# seconds a refresh token checked as not revoked stays cached (shared caches only; accounts.revocation)
+TOKEN_REVOCATION_LIVE_TTL = int(os.getenv('TOKEN_REVOCATION_LIVE_TTL', 300))
+# largest manifest accepted by the bulk import (contributions.bulk_import)
+BULK_IMPORT_MAX_CONTRIBUTIONS = int(os.getenv('BULK_IMPORT_MAX_CONTRIBUTIONS', 1000))
+# trending scores (contributions.trending, refreshed by manage.py refresh_trending)
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 48))
+# co-enrollment recommendations (contributions.recommendations, manage.py refresh_recommendations)
+RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', 10))
+RECOMMENDATIONS_MIN_COMMON = int(os.getenv('RECOMMENDATIONS_MIN_COMMON', 1))
+# days raw view events are kept after roll-up / hourly rollups are kept (user_stats.rollups)
+VIEW_EVENT_RETENTION_DAYS = int(os.getenv('VIEW_EVENT_RETENTION_DAYS', 7))
+VIEW_HOURLY_ROLLUP_RETENTION_DAYS = int(os.getenv('VIEW_HOURLY_ROLLUP_RETENTION_DAYS', 90))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -166,11 +224,18 @@ EMAIL_PORT = os.getenv('EMAIL_PORT', 587)
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 20))
+
+# outbox worker (manage.py send_queued_emails)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', 300))
 
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -255,6 +320,11 @@ cloudinary.config(
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 GOOGLE_OAUTH_CLIENT_ID =os.getenv('GOOGLE_OAUTH_CLIENT_ID')
+GOOGLE_OAUTH_CERTS_URL = os.getenv('GOOGLE_OAUTH_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+GOOGLE_OAUTH_USERINFO_URL = os.getenv('GOOGLE_OAUTH_USERINFO_URL', 'https://www.googleapis.com/oauth2/v3/userinfo')
+GOOGLE_HTTP_TIMEOUT = (3, 5)  # connect, read seconds
+GOOGLE_USERINFO_CACHE_TIMEOUT = 300
+GOOGLE_CERTS_REFRESH_INTERVAL = 60  # at most one early certificate refetch per interval
 
 
 
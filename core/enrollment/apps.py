@@ -1,6 +1,25 @@
+import atexit
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
+
+def drain_view_counters():
+    from .view_counters import view_counter_buffer
+    try:
+        view_counter_buffer.flush()
+    except Exception:
+        logger.exception("Draining buffered view counts on shutdown failed")
+
 
 class EnrollmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'enrollment'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # write what this worker buffered last instead of waiting for the next flush
+        atexit.register(drain_view_counters)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from enrollment.view_counters import view_counter_buffer
+
+
+class Command(BaseCommand):
+    help = "Write buffered video view counts to the database. Run from cron or on deploy/shutdown."
+
+    def handle(self, *args, **options):
+        if not view_counter_buffer.enabled:
+            # a process-local buffer cannot be drained from another process
+            raise CommandError(
+                f"The view counter buffer needs a shared Redis cache (CACHES[{view_counter_buffer.cache_alias!r}]); "
+                "without one views are written straight through and there is nothing to flush."
+            )
+        flushed = view_counter_buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} buffered views."))
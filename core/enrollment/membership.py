@@ -0,0 +1,82 @@
+"""
+Per-user cache of enrolled contribution ids, so access checks for videos
+and notes usually cost no query.
+
+Sets are stored under a per-user version, which moves whenever one of the
+user's enrollments is created or deleted (see signals.py). A request that
+read the enrollments before such a change committed stores its set under
+the old version, where nobody looks any more, instead of writing a stale
+set back over the invalidation.
+"""
+
+from uuid import uuid4
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.http import Http404
+
+MEMBERSHIP_TTL = 60 * 60
+
+
+def _version_key(user_id):
+    return f'enrollment:version:{user_id}'
+
+
+def _key(user_id):
+    version_key = _version_key(user_id)
+    version = cache.get(version_key)
+    if version is None:
+        # a lost version starts a new one, never an old one that may still have a set
+        version = uuid4().hex
+        if not cache.add(version_key, version, timeout=None):
+            version = cache.get(version_key, version)
+    return f'enrollment:user:{user_id}:{version}'
+
+
+def invalidate_enrollments(user_id):
+    cache.set(_version_key(user_id), uuid4().hex, timeout=None)
+
+
+def enrolled_contribution_ids(user_id):
+    """
+    Ids (as strings) of the contributions the user is enrolled in.
+    """
+    from .models import Enrollement
+
+    key = _key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            str(pk) for pk in Enrollement.objects.filter(user_id=user_id).values_list('contribution_id', flat=True)
+        )
+        cache.add(key, ids, MEMBERSHIP_TTL)
+    return ids
+
+
+def get_with_access_or_404(model, pk, user, fields):
+    """
+    Fetch a video/note (only `fields`) and whether the user is enrolled in its contribution.
+
+    With the user's enrollment set cached this is the object lookup alone.
+    On a miss the object, its contribution id and the user's enrolled ids come
+    back in one query, and the set is cached for the next request.
+    """
+    from .models import Enrollement
+
+    queryset = model.objects.only(*fields, 'contribution')
+    key = _key(user.pk)
+    ids = cache.get(key)
+    try:
+        if ids is not None:
+            obj = queryset.get(pk=pk)
+        else:
+            obj = queryset.annotate(
+                enrolled_ids=ArraySubquery(Enrollement.objects.filter(user_id=user.pk).values('contribution_id'))
+            ).get(pk=pk)
+            ids = frozenset(str(contribution_id) for contribution_id in obj.enrolled_ids)
+            cache.add(key, ids, MEMBERSHIP_TTL)
+    except model.DoesNotExist:
+        raise Http404
+
+    allowed = obj.contribution_id is not None and str(obj.contribution_id) in ids
+    return obj, allowed
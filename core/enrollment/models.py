@@ -28,6 +28,27 @@ class ContributionVideoViewCount(models.Model):
 
 
 
+class VideoViewEvent(models.Model):
+    """
+    Append-only log of every video play, repeat views included. Written in
+    batches by the view counter buffer and folded into hourly/daily rollups
+    by user_stats.rollups. viewed_at is when the play happened, logged_at when
+    the row was inserted (the rollups' commit watermark). The foreign keys carry no constraints or indexes
+    so inserts stay cheap; rolled up rows are pruned after a retention window.
+    """
+    id = models.BigAutoField(primary_key=True)
+    video = models.ForeignKey(ContributionVideos, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, db_index=False)
+    contribution = models.ForeignKey(Contributions, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, db_index=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, db_index=False)
+    # the user's first view of this video (the ones counted in total_views)
+    first_view = models.BooleanField(default=False)
+    viewed_at = models.DateTimeField()
+    logged_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"View of {self.video_id} at {self.viewed_at}"
+
+
 class Enrollement(models.Model):
     """
     Model for storing enrollements of users in contributions.
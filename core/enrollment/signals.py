@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from contributions.counters import bump_counter, deleted_with_contribution
+from .membership import invalidate_enrollments
+from .models import Enrollement
+
+
+@receiver(post_save, sender=Enrollement)
+def enrollment_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_counter(instance.contribution_id, 'enrollment_count', 1)
+        transaction.on_commit(lambda: invalidate_enrollments(instance.user_id))
+
+
+@receiver(post_delete, sender=Enrollement)
+def enrollment_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_contribution(origin):
+        bump_counter(instance.contribution_id, 'enrollment_count', -1)
+    transaction.on_commit(lambda: invalidate_enrollments(instance.user_id))
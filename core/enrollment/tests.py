@@ -1,3 +1,148 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from contributions.models import Contributions, ContributionVideos
+from . import membership, view_counters
+from .membership import enrolled_contribution_ids
+from .models import Enrollement, VideoViewEvent
+from .view_counters import ViewCounterBuffer
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+BUFFER_CACHES = {**settings.CACHES, 'view_buffer': {'BACKEND': LOCMEM, 'LOCATION': 'view-buffer-tests'}}
+
+
+class ViewCounterTestCase(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create(username='creator', email='creator@example.com')
+        self.viewer = User.objects.create(username='viewer', email='viewer@example.com')
+        self.contribution = Contributions.objects.create(title='Networks', active=True, user=self.creator)
+        self.video = ContributionVideos.objects.create(contribution=self.contribution, title='Lecture 1')
+
+    def total_views(self):
+        return (
+            ContributionVideos.objects.get(pk=self.video.pk).total_views,
+            Contributions.objects.get(pk=self.contribution.pk).total_views,
+        )
+
+
+@override_settings(CACHES={**settings.CACHES, 'view_buffer': {'BACKEND': LOCMEM}})
+class WriteThroughTests(ViewCounterTestCase):
+    """
+    Without a shared Redis nothing is buffered.
+    """
+
+    def test_views_are_written_straight_away(self):
+        buffer = ViewCounterBuffer()
+        self.assertFalse(buffer.enabled)
+
+        buffer.record(self.video.pk, self.contribution.pk, self.viewer.pk, unique=True)
+        buffer.record(self.video.pk, self.contribution.pk, self.viewer.pk, unique=False)
+
+        self.assertEqual(self.total_views(), (1, 1))
+        self.assertEqual(list(VideoViewEvent.objects.values_list('first_view', flat=True).order_by('id')), [True, False])
+        self.assertEqual(buffer.buffered_views(self.video.pk), 0)
+
+    def test_flush_command_refuses_to_run(self):
+        with self.assertRaises(CommandError):
+            call_command('flush_view_counters')
+
+
+@override_settings(CACHES=BUFFER_CACHES)
+@mock.patch.object(view_counters, 'SHARED_BACKENDS', (*view_counters.SHARED_BACKENDS, LOCMEM))
+class BufferedViewTests(ViewCounterTestCase):
+    """
+    The buffered path, with locmem standing in for Redis.
+    """
+
+    def setUp(self):
+        super().setUp()
+        caches['view_buffer'].clear()
+        # no flush from record() itself
+        self.buffer = ViewCounterBuffer(flush_interval=3600)
+        caches['view_buffer'].set('viewbuf:flush-due', 1, timeout=3600)
+
+    def test_views_wait_for_the_flush(self):
+        for _ in range(3):
+            self.buffer.record(self.video.pk, self.contribution.pk, self.viewer.pk, unique=True)
+        self.buffer.record(self.video.pk, self.contribution.pk, self.viewer.pk, unique=False)
+
+        self.assertEqual(self.total_views(), (0, 0))
+        self.assertEqual(self.buffer.buffered_views(self.video.pk), 3)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.total_views(), (3, 3))
+        self.assertEqual(VideoViewEvent.objects.count(), 4)
+        self.assertEqual(self.buffer.buffered_views(self.video.pk), 0)
+
+        # nothing is written twice
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.total_views(), (3, 3))
+        self.assertEqual(VideoViewEvent.objects.count(), 4)
+
+    def test_failed_write_keeps_the_views(self):
+        self.buffer.record(self.video.pk, self.contribution.pk, None, unique=True)
+
+        with mock.patch.object(ViewCounterBuffer, 'write', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.buffered_views(self.video.pk), 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.total_views(), (1, 1))
+
+    def test_lost_sequence_starts_over(self):
+        self.buffer.record(self.video.pk, self.contribution.pk, self.viewer.pk, unique=True)
+        self.buffer.flush()
+        # Redis restarted: the counters are gone but the flushed marks survived elsewhere
+        caches['view_buffer'].set('viewbuf:flushed', 50, timeout=None)
+        caches['view_buffer'].set('viewbuf:events-flushed', 50, timeout=None)
+
+        self.buffer.record(self.video.pk, self.contribution.pk, self.viewer.pk, unique=True)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.total_views(), (2, 2))
+
+
+class MembershipCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create(username='student', email='student@example.com')
+        self.first = Contributions.objects.create(title='Networks', active=True)
+        self.second = Contributions.objects.create(title='Security', active=True)
+
+    def enroll(self, contribution):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollement.objects.create(user=self.student, contribution=contribution)
+
+    def test_enrollments_are_cached_until_they_change(self):
+        self.enroll(self.first)
+        self.assertEqual(enrolled_contribution_ids(self.student.pk), {str(self.first.pk)})
+        with self.assertNumQueries(0):
+            enrolled_contribution_ids(self.student.pk)
+
+        self.enroll(self.second)
+        self.assertEqual(enrolled_contribution_ids(self.student.pk), {str(self.first.pk), str(self.second.pk)})
+
+    def test_a_set_read_before_an_enrollment_does_not_outlive_it(self):
+        self.enroll(self.first)
+
+        def enroll_before(store):
+            def write(key, value, timeout=None):
+                # the enrollment commits between this request's read and its cache write
+                if isinstance(value, frozenset):
+                    self.enroll(self.second)
+                return store(key, value, timeout)
+            return write
+
+        fake_cache = mock.Mock(wraps=cache)
+        fake_cache.add.side_effect = enroll_before(cache.add)
+        fake_cache.set.side_effect = enroll_before(cache.set)
+        with mock.patch.object(membership, 'cache', fake_cache):
+            self.assertEqual(enrolled_contribution_ids(self.student.pk), {str(self.first.pk)})
+
+        self.assertEqual(enrolled_contribution_ids(self.student.pk), {str(self.first.pk), str(self.second.pk)})
@@ -0,0 +1,270 @@
+"""
+Write-behind buffer for video view counters.
+
+ContributionVideoWatch records each new unique view here instead of doing a
+read-modify-write save() on the video and contribution rows. Increments are
+kept in the `view_buffer` cache and periodically flushed as batched
+`total_views = total_views + n` updates, so concurrent viewers never contend
+on the same rows.
+
+The journal is the only copy of buffered views, so it needs a Redis cache
+shared by every worker that does not evict keys without a TTL (maxmemory-policy
+noeviction or volatile-*). Without one (local development on locmem) there is
+nothing safe to buffer into and views are written straight through.
+
+Every play (repeat views included) is also appended to a journal of view
+events that the same flush writes to VideoViewEvent with bulk inserts (or
+written straight through, like the counts, without a shared Redis).
+
+Cache layout:
+    viewbuf:video:<video_id>    pending increments of one video
+    viewbuf:pending:<video_id>  marker, the video is listed in the journal
+    viewbuf:entry:<n>           journal entry n: (video_id, contribution_id)
+    viewbuf:seq / viewbuf:flushed   last journal entry written / flushed
+    viewbuf:event:<n>           view event n: (video_id, contribution_id, user_id, first view, time)
+    viewbuf:event-seq / viewbuf:events-flushed   last view event written / flushed
+    viewbuf:events-seen         event-seq at the previous flush
+"""
+
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'viewbuf'
+SHARED_BACKENDS = ('django.core.cache.backends.redis.RedisCache', 'django_redis.cache.RedisCache')
+# a pending marker outlives a lost journal entry by this many flush intervals
+PENDING_TTL_INTERVALS = 10
+
+
+def _apply_deltas(model, deltas):
+    """
+    One UPDATE per distinct delta: rows that gained the same number of views share a statement.
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(total_views=F('total_views') + delta)
+
+
+class ViewCounterBuffer:
+    def __init__(self, cache_alias=None, flush_interval=None, batch_size=500):
+        self._cache_alias = cache_alias
+        self._flush_interval = flush_interval
+        self.batch_size = batch_size
+
+    @property
+    def cache_alias(self):
+        return self._cache_alias or getattr(settings, 'VIEW_COUNTER_CACHE', 'view_buffer')
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def enabled(self):
+        """
+        Whether views are buffered, i.e. the buffer cache is a shared Redis.
+        """
+        config = settings.CACHES.get(self.cache_alias)
+        return bool(config) and config.get('BACKEND') in SHARED_BACKENDS
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30)
+
+    def _key(self, *parts):
+        return ':'.join([PREFIX, *map(str, parts)])
+
+    def _incr(self, key, delta=1):
+        if self.cache.add(key, delta, timeout=None):
+            return delta
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # evicted between add() and incr()
+            self.cache.set(key, delta, timeout=None)
+            return delta
+
+    def record(self, video_id, contribution_id, user_id=None, unique=True):
+        """
+        Buffer one view of a video. Only unique views count towards total_views;
+        every view of a known user goes to the event log.
+        """
+        if not self.enabled:
+            self.write_through(video_id, contribution_id, user_id, unique)
+            return
+        if unique:
+            self._buffer(video_id, contribution_id, 1)
+        if user_id is not None:
+            seq = self._incr(self._key('event-seq'))
+            self.cache.set(
+                self._key('event', seq),
+                (str(video_id), str(contribution_id), str(user_id), unique, timezone.now()),
+                timeout=None,
+            )
+        self.maybe_flush()
+
+    def write_through(self, video_id, contribution_id, user_id, unique):
+        with transaction.atomic():
+            if unique:
+                self.write({str(video_id): 1}, {str(contribution_id): 1})
+            if user_id is not None:
+                self.write_events([(str(video_id), str(contribution_id), str(user_id), unique, timezone.now())])
+
+    def _buffer(self, video_id, contribution_id, count):
+        # The count is bumped before the journal marker is checked, and flush()
+        # removes the marker before reading counts, so every increment is
+        # either read by a flush or journaled again.
+        self._incr(self._key('video', video_id), count)
+        pending_ttl = self.flush_interval * PENDING_TTL_INTERVALS
+        if self.cache.add(self._key('pending', video_id), 1, timeout=pending_ttl):
+            seq = self._incr(self._key('seq'))
+            self.cache.set(self._key('entry', seq), (str(video_id), str(contribution_id)), timeout=None)
+
+    def buffered_views(self, video_id):
+        if not self.enabled:
+            return 0
+        return self.cache.get(self._key('video', video_id)) or 0
+
+    def maybe_flush(self):
+        if self.cache.add(self._key('flush-due'), 1, timeout=self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing buffered view counts failed")
+
+    def flush(self):
+        """
+        Drain the journal into the database. Returns the number of views written.
+        """
+        if not self.enabled:
+            return 0
+        lock = self._key('flush-lock')
+        if not self.cache.add(lock, 1, timeout=300):
+            return 0
+        flushed = 0
+        try:
+            start = self.cache.get(self._key('flushed')) or 0
+            end = self.cache.get(self._key('seq')) or 0
+            if end < start:
+                # the sequence was lost and restarted; flushed entries are gone, start over
+                logger.warning("View counter journal restarted at %s (flushed up to %s)", end, start)
+                start = 0
+                self.cache.set(self._key('flushed'), 0, timeout=None)
+            while start < end:
+                stop = min(end, start + self.batch_size)
+                flushed += self._flush_entries(range(start + 1, stop + 1))
+                self.cache.set(self._key('flushed'), stop, timeout=None)
+                start = stop
+            events = self._flush_events()
+            if events:
+                logger.debug("Wrote %s view events", events)
+        finally:
+            self.cache.delete(lock)
+        return flushed
+
+    def _flush_entries(self, seqs):
+        entry_keys = [self._key('entry', seq) for seq in seqs]
+        entries = self.cache.get_many(entry_keys)
+        self.cache.delete_many(entry_keys)
+
+        contributions = dict(entries.values())
+        self.cache.delete_many([self._key('pending', video_id) for video_id in contributions])
+
+        video_deltas = {}
+        for video_id in contributions:
+            key = self._key('video', video_id)
+            count = self.cache.get(key) or 0
+            if not count:
+                continue
+            try:
+                self.cache.decr(key, count)
+            except ValueError:
+                continue
+            video_deltas[video_id] = count
+
+        contribution_deltas = defaultdict(int)
+        for video_id, count in video_deltas.items():
+            contribution_deltas[contributions[video_id]] += count
+
+        try:
+            self.write(video_deltas, dict(contribution_deltas))
+        except Exception:
+            # hand the claimed counts back so the next flush retries them
+            for video_id, count in video_deltas.items():
+                self._buffer(video_id, contributions[video_id], count)
+            raise
+        return sum(video_deltas.values())
+
+    def _flush_events(self):
+        """
+        Move journaled view events to the database, returns how many were written.
+        An event number is taken before its entry is stored, so a missing entry
+        numbered after the previous flush is still being written and ends this
+        run; older gaps were evicted and are skipped.
+        """
+        start = self.cache.get(self._key('events-flushed')) or 0
+        end = self.cache.get(self._key('event-seq')) or 0
+        settled = self.cache.get(self._key('events-seen')) or 0
+        if end < start:
+            # the sequence was lost and restarted; nothing numbered since then is settled
+            logger.warning("View event journal restarted at %s (flushed up to %s)", end, start)
+            start = settled = 0
+            self.cache.set(self._key('events-flushed'), 0, timeout=None)
+        self.cache.set(self._key('events-seen'), end, timeout=None)
+        written = 0
+        while start < end:
+            seqs = range(start + 1, min(end, start + self.batch_size) + 1)
+            entries = self.cache.get_many([self._key('event', seq) for seq in seqs])
+            ready = []
+            pending = False
+            for seq in seqs:
+                entry = entries.get(self._key('event', seq))
+                if entry is None and seq > settled:
+                    pending = True
+                    break
+                if entry is not None:
+                    ready.append(entry)
+                start = seq
+            if ready:
+                self.write_events(ready)
+                written += len(ready)
+            self.cache.set(self._key('events-flushed'), start, timeout=None)
+            self.cache.delete_many([self._key('event', n) for n in seqs if n <= start])
+            if pending:
+                break
+        return written
+
+    def write_events(self, entries):
+        from .models import VideoViewEvent
+
+        VideoViewEvent.objects.bulk_create(
+            [
+                VideoViewEvent(video_id=video_id, contribution_id=contribution_id, user_id=user_id,
+                               first_view=first_view, viewed_at=viewed_at)
+                for video_id, contribution_id, user_id, first_view, viewed_at in entries
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def write(self, video_deltas, contribution_deltas):
+        from contributions.models import ContributionVideos, Contributions
+        from user_stats.stats import add_contribution_views
+
+        with transaction.atomic():
+            _apply_deltas(ContributionVideos, video_deltas)
+            _apply_deltas(Contributions, contribution_deltas)
+            add_contribution_views(contribution_deltas)
+
+
+view_counter_buffer = ViewCounterBuffer()
@@ -8,6 +8,10 @@ from .models import ContributionVideoViewCount,Enrollement
 from .serializers import EnrollmentSerializer,GetEnrollmentSerializer,GetEnrollmentDetailSerializer
 from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
+from core.query_planning import apply_query_plan
+from .view_counters import view_counter_buffer
+from .membership import get_with_access_or_404
+from accounts.authentication import ClaimsJWTAuthentication
 
 
 
@@ -33,11 +37,11 @@ class EnrollmentView(APIView):
         user=request.user
         try:
             if enrollment_id:
-                enrollment = Enrollement.objects.get(id=enrollment_id)
+                enrollment = apply_query_plan(Enrollement.objects.all(), GetEnrollmentDetailSerializer).get(id=enrollment_id)
                 serializer = GetEnrollmentDetailSerializer(enrollment)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             else:
-                enrollments = Enrollement.objects.filter(user=user).select_related('user', 'contribution')
+                enrollments = apply_query_plan(Enrollement.objects.filter(user=user), GetEnrollmentSerializer)
                 serializer = GetEnrollmentSerializer(enrollments, many=True)
                 return Response({"message": "Enrollments retrieved successfully", "data": serializer.data}, status=status.HTTP_200_OK)
         except Enrollement.DoesNotExist:
@@ -50,14 +54,16 @@ class EnrollmentView(APIView):
 class ContributionVideoWatch(APIView):
     """
     Track a unique view for a video and return the video file URL.
+    Only needs the user id, so the user comes from the token claims.
     """
+    authentication_classes = [ClaimsJWTAuthentication]
+
     def get(self, request, video_id):
         user = request.user
-        video = get_object_or_404(ContributionVideos, id=video_id)
-        contribution = video.contribution
+        video, enrolled = get_with_access_or_404(ContributionVideos, video_id, user, ('title', 'video_file', 'total_views'))
 
 # --- ENROLLMENT CHECK ---
-        if not contribution.is_enrolled(user):
+        if not enrolled:
             return Response(
                 {"error": "You must enroll in this contribution to watch the video."},
                 status=403
@@ -66,18 +72,15 @@ class ContributionVideoWatch(APIView):
         try:
             ContributionVideoViewCount.objects.create(
                 video=video,
-                user=user
+                user_id=user.pk
             )
-            # If created → increment counters
-            video.total_views = video.total_views + 1
-            video.save(update_fields=["total_views"])
-
-            contribution.total_views = contribution.total_views + 1
-            contribution.save(update_fields=["total_views"])
-
+            unique = True
         except IntegrityError:
             # Already viewed → don’t increment
-            pass
+            unique = False
+
+        # buffered: unique views go to the counters, every view to the event log
+        view_counter_buffer.record(video.id, video.contribution_id, user.pk, unique=unique)
 
         # Return the actual video URL
         return Response(
@@ -85,7 +88,7 @@ class ContributionVideoWatch(APIView):
                 "video_id": str(video.id),
                 "title": video.title,
                 "video_url": video.video_file,
-                "total_views": video.total_views,
+                "total_views": video.total_views + view_counter_buffer.buffered_views(video.id),
             },
             status=200
         )
@@ -96,13 +99,14 @@ class EnrolledContributionNotesView(APIView):
     Return a note file URL only if the user is enrolled
     in the contribution.
     """
+    authentication_classes = [ClaimsJWTAuthentication]
+
     def get(self, request, note_id):
         user = request.user
-        note = get_object_or_404(ContributionNotes, id=note_id)
-        contribution = note.contribution
+        note, enrolled = get_with_access_or_404(ContributionNotes, note_id, user, ('title', 'note_file'))
 
         # --- ENROLLMENT CHECK ---
-        if not contribution.is_enrolled(user):
+        if not enrolled:
             return Response({"error": "You must enroll in this contribution to access notes."},status=403)
 
         return Response(
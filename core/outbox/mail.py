@@ -0,0 +1,123 @@
+"""
+Email outbox: views enqueue, a worker delivers.
+
+enqueue_email() only inserts a row. deliver_batch() claims due messages with
+SELECT ... FOR UPDATE SKIP LOCKED (several workers can run side by side),
+sends them over one SMTP connection and reschedules failures with
+exponential backoff. A claimed message is leased until next_attempt_at, so
+a worker that dies mid-batch only delays its messages.
+
+Tests can point EMAIL_BACKEND at django.core.mail.backends.locmem.EmailBackend
+(or the filebased backend / a local debugging SMTP server).
+"""
+
+import logging
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        recipients=list(recipients),
+        from_email=from_email or settings.EMAIL_HOST_USER,
+    )
+
+
+def backoff(attempts):
+    """
+    Delay before retry number `attempts`: 30s, 1m, 2m, 4m ... capped at one hour.
+    """
+    base = _setting('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        messages = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if messages:
+            EmailOutbox.objects.filter(pk__in=[m.pk for m in messages]).update(
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + lease,
+            )
+    for message in messages:
+        message.attempts += 1
+    return messages
+
+
+def _record_failure(message, error, max_attempts):
+    """
+    Reschedule a failed message with backoff, or give up on it after max_attempts.
+    """
+    logger.warning("Sending email %s failed (attempt %s): %s", message.pk, message.attempts, error)
+    if message.attempts >= max_attempts:
+        EmailOutbox.objects.filter(pk=message.pk).update(status=EmailOutbox.FAILED, last_error=str(error))
+    else:
+        EmailOutbox.objects.filter(pk=message.pk).update(
+            next_attempt_at=timezone.now() + backoff(message.attempts), last_error=str(error)
+        )
+
+
+def deliver_batch(batch_size=50, connection=None):
+    """
+    Deliver up to batch_size due messages over one connection.
+    Returns (sent, failed) counts. When the connection cannot be opened at all,
+    the whole batch counts as failed and is rescheduled like any other failure.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0, 0
+
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+    try:
+        connection = connection or get_connection(fail_silently=False)
+        connection.open()
+    except Exception as e:
+        for message in messages:
+            _record_failure(message, e, max_attempts)
+        return 0, len(messages)
+
+    sent = failed = 0
+    try:
+        for message in messages:
+            email = EmailMessage(
+                message.subject, message.body, message.from_email, message.recipients, connection=connection
+            )
+            try:
+                try:
+                    email.send()
+                except SMTPServerDisconnected:
+                    # the server dropped the reused connection; reconnect once
+                    connection.close()
+                    connection.open()
+                    email.send()
+            except Exception as e:
+                failed += 1
+                _record_failure(message, e, max_attempts)
+            else:
+                sent += 1
+                EmailOutbox.objects.filter(pk=message.pk).update(status=EmailOutbox.SENT, sent_at=timezone.now())
+    finally:
+        connection.close()
+    return sent, failed
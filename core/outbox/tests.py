@@ -0,0 +1,89 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .mail import backoff, deliver_batch, enqueue_email
+from .models import EmailOutbox
+
+
+class FlakyBackend(EmailBackend):
+    """
+    locmem backend whose sends fail for one recipient.
+    """
+
+    def send_messages(self, messages):
+        if any('down@example.com' in message.to for message in messages):
+            raise ConnectionError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+class UnreachableBackend(EmailBackend):
+    """
+    locmem backend that cannot connect, like an SMTP server that is down.
+    """
+
+    def open(self):
+        raise ConnectionRefusedError("connection refused")
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_BASE_SECONDS=30)
+class DeliveryTests(TestCase):
+    def test_pending_messages_are_sent_once(self):
+        for n in range(3):
+            enqueue_email(f'Subject {n}', 'Body', [f'user{n}@example.com'])
+
+        self.assertEqual(deliver_batch(batch_size=2), (2, 0))
+        self.assertEqual(deliver_batch(batch_size=2), (1, 0))
+        self.assertEqual(deliver_batch(batch_size=2), (0, 0))
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ['Subject 0', 'Subject 1', 'Subject 2'])
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.SENT).count(), 3)
+
+    def test_failures_back_off_then_give_up(self):
+        failed = enqueue_email('Subject', 'Body', ['down@example.com'])
+        enqueue_email('Subject', 'Body', ['up@example.com'])
+
+        self.assertEqual(deliver_batch(connection=FlakyBackend()), (1, 1))
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (EmailOutbox.PENDING, 1))
+        self.assertIn('mailbox unavailable', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+        # not due yet
+        self.assertEqual(deliver_batch(connection=FlakyBackend()), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(connection=FlakyBackend()), (0, 1))
+        self.assertEqual(EmailOutbox.objects.get(pk=failed.pk).status, EmailOutbox.FAILED)
+
+    def test_backoff_doubles_up_to_an_hour(self):
+        self.assertEqual([backoff(n).total_seconds() for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(backoff(20), timedelta(hours=1))
+
+    def test_messages_claimed_by_a_dead_worker_come_back_after_the_lease(self):
+        message = enqueue_email('Subject', 'Body', ['user@example.com'])
+        with mock.patch('outbox.mail.EmailMessage.send', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                deliver_batch()
+
+        self.assertEqual(deliver_batch(), (0, 0))
+        EmailOutbox.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(), (1, 0))
+
+    def test_unreachable_server_reschedules_the_whole_batch(self):
+        for n in range(2):
+            enqueue_email(f'Subject {n}', 'Body', [f'user{n}@example.com'])
+
+        self.assertEqual(deliver_batch(connection=UnreachableBackend()), (0, 2))
+        for message in EmailOutbox.objects.all():
+            self.assertEqual((message.status, message.attempts), (EmailOutbox.PENDING, 1))
+            self.assertIn('connection refused', message.last_error)
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(connection=UnreachableBackend()), (0, 2))
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.FAILED).count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
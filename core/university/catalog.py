@@ -0,0 +1,82 @@
+"""
+Precomputed university -> department catalog.
+
+The whole tree is rendered once to compact JSON (plus a gzipped copy) and
+kept in the cache under the current "catalog" version stamp, which the
+signals in signals.py bump on any University, Department or M2M change.
+Each process also keeps the last snapshot in memory, so a request costs
+one cache lookup of the version stamp. A snapshot older than
+CATALOG_SNAPSHOT_TTL seconds is rebuilt even when the stamp has not moved,
+so a missed bump (a QuerySet.update(), or stamps in a per-process cache)
+serves a stale catalog for at most that long.
+"""
+
+import gzip
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.response_cache import current_versions
+
+SNAPSHOT_KEY = 'catalog:snapshot:'
+
+# (version stamp, snapshot) last used by this process
+_memo = None
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder, separators=(',', ':')).encode()
+
+
+class CatalogSnapshot:
+    def __init__(self, universities):
+        self.body = _dumps(universities)
+        self.gzipped = gzip.compress(self.body, compresslevel=9)
+        self.version = hashlib.sha256(self.body).hexdigest()[:20]
+        # wall clock: snapshots are shared between processes through the cache
+        self.built_at = time.time()
+        self.departments = {
+            str(university['id']): _dumps(university['departments'])
+            for university in universities
+        }
+
+    def departments_of(self, university_id):
+        """
+        The JSON list of a university's departments, None for an unknown university.
+        """
+        return self.departments.get(str(university_id))
+
+
+def build_snapshot():
+    from .models import Department, University
+    from .serializers import UniversitySerializer
+
+    universities = University.objects.only('id', 'name').prefetch_related(
+        Prefetch('departments', queryset=Department.objects.only('id', 'name'))
+    )
+    return CatalogSnapshot(UniversitySerializer(universities, many=True).data)
+
+
+def _fresh(snapshot, ttl):
+    return snapshot is not None and time.time() - snapshot.built_at <= ttl
+
+
+def get_snapshot():
+    global _memo
+    ttl = getattr(settings, 'CATALOG_SNAPSHOT_TTL', 600)
+    stamp = current_versions(('catalog',))[0]
+    memo = _memo
+    if memo is not None and memo[0] == stamp and _fresh(memo[1], ttl):
+        return memo[1]
+
+    snapshot = cache.get(SNAPSHOT_KEY + stamp)
+    if not _fresh(snapshot, ttl):
+        snapshot = build_snapshot()
+        cache.set(SNAPSHOT_KEY + stamp, snapshot, timeout=ttl)
+    _memo = (stamp, snapshot)
+    return snapshot
@@ -0,0 +1,136 @@
+"""
+Bulk loader for the university -> department catalog.
+
+Input is a list of {"name": <university>, "departments": [<name>, ...]}
+(optionally wrapped in {"universities": [...]}) or CSV with `university`
+and `department` columns. Department names are deduplicated
+case-insensitively across the whole catalog and an existing department
+with the same name is reused, so every university links to one shared
+row per name. Loading costs the same handful of queries whatever the
+catalog size, and loading the same catalog again changes nothing.
+"""
+
+import csv
+import io
+import json
+from uuid import uuid4
+
+from django.db import connection, transaction
+
+from core.response_cache import bump_versions_on_commit
+from .models import Department, University
+
+# pg_advisory_xact_lock key serializing concurrent loads
+LOCK_KEY = 0x6b6c6b01
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def clean_name(name):
+    return ' '.join(str(name or '').split())
+
+
+def name_key(name):
+    return clean_name(name).casefold()
+
+
+def parse_catalog(content, fmt=None):
+    """
+    {university name: [department names]} from JSON or CSV text/bytes.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if fmt is None:
+        fmt = 'json' if content.lstrip()[:1] in ('[', '{') else 'csv'
+
+    catalog = {}
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(content))
+        if not reader.fieldnames or 'university' not in reader.fieldnames:
+            raise CatalogError("CSV catalogs need a `university` column (and `department`).")
+        for row in reader:
+            university = clean_name(row.get('university'))
+            if university:
+                catalog.setdefault(university, []).append(row.get('department'))
+        return catalog
+
+    try:
+        data = json.loads(content)
+    except ValueError as e:
+        raise CatalogError(f"Invalid JSON: {e}")
+    return catalog_from_data(data)
+
+
+def catalog_from_data(data):
+    if isinstance(data, dict):
+        data = data.get('universities')
+    if not isinstance(data, list):
+        raise CatalogError("Expected a list of universities.")
+    catalog = {}
+    for entry in data:
+        if not isinstance(entry, dict) or not clean_name(entry.get('name')):
+            raise CatalogError("Every university needs a `name`.")
+        departments = entry.get('departments') or []
+        if not isinstance(departments, list):
+            raise CatalogError(f"`departments` of {entry['name']!r} must be a list of names.")
+        catalog.setdefault(clean_name(entry['name']), []).extend(departments)
+    return catalog
+
+
+def load_catalog(catalog):
+    """
+    Create missing universities, departments and links; returns counts of what was created.
+    """
+    catalog = {
+        university: {name_key(d): clean_name(d) for d in departments if clean_name(d)}
+        for university, departments in catalog.items()
+    }
+    wanted = {}
+    for departments in catalog.values():
+        wanted.update(departments)
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_KEY])
+
+        # departments: reuse the oldest row per name, create the rest with ids known up front
+        department_ids = {}
+        for pk, name in Department.objects.filter(name__isnull=False).order_by('pk').values_list('pk', 'name'):
+            department_ids.setdefault(name_key(name), pk)
+        new_departments = [
+            Department(id=uuid4(), name=name) for key, name in wanted.items() if key not in department_ids
+        ]
+        Department.objects.bulk_create(new_departments)
+        department_ids.update({name_key(d.name): d.pk for d in new_departments})
+
+        # universities: names are unique
+        existing = set(University.objects.filter(name__in=list(catalog)).values_list('name', flat=True))
+        new_universities = [University(name=name) for name in catalog if name not in existing]
+        University.objects.bulk_create(new_universities, ignore_conflicts=True)
+        university_ids = dict(University.objects.filter(name__in=list(catalog)).values_list('name', 'pk'))
+
+        Through = University.departments.through
+        links = {
+            (university_ids[university], department_ids[key])
+            for university, departments in catalog.items()
+            for key in departments
+        }
+        linked = set(
+            Through.objects.filter(university_id__in=list(university_ids.values()))
+            .values_list('university_id', 'department_id')
+        )
+        new_links = [Through(university_id=u, department_id=d) for u, d in links - linked]
+        Through.objects.bulk_create(new_links, batch_size=1000, ignore_conflicts=True)
+
+        created = {
+            'universities': len(new_universities),
+            'departments': len(new_departments),
+            'links': len(new_links),
+        }
+        if any(created.values()):
+            # bulk_create sends no signals
+            bump_versions_on_commit('catalog', 'contributions')
+    return created
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from university.loader import CatalogError, load_catalog, parse_catalog
+
+
+class Command(BaseCommand):
+    help = "Create universities, departments and their links from a JSON or CSV catalog. Safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalog', help="Path to the catalog file.")
+        parser.add_argument('--format', choices=['json', 'csv'], help="Catalog format; guessed from the file when omitted.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['catalog'].lower().endswith('.csv') else None)
+        with open(options['catalog'], 'rb') as catalog:
+            try:
+                created = load_catalog(parse_catalog(catalog.read(), fmt))
+            except CatalogError as e:
+                raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['universities']} universities, {created['departments']} departments "
+            f"and {created['links']} links."
+        ))
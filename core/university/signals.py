@@ -0,0 +1,13 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.response_cache import bump_versions_on_commit
+from .models import Department, University
+
+
+@receiver([post_save, post_delete], sender=University)
+@receiver([post_save, post_delete], sender=Department)
+@receiver(m2m_changed, sender=University.departments.through)
+def catalog_changed(sender, **kwargs):
+    # contribution cards embed university and department names
+    bump_versions_on_commit('catalog', 'contributions')
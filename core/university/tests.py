@@ -1,3 +1,145 @@
-from django.test import TestCase
+import gzip
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import catalog
+from .catalog import get_snapshot
+from .loader import CatalogError, load_catalog, parse_catalog
+from .models import Department, University
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._memo = None
+        self.department = Department.objects.create(name='Computer Science')
+        self.university = University.objects.create(name='North University')
+        self.university.departments.add(self.department)
+
+    def names(self, snapshot):
+        return [university['name'] for university in json.loads(snapshot.body)]
+
+
+@override_settings(CATALOG_SNAPSHOT_TTL=600)
+class CatalogSnapshotTests(CatalogTestCase):
+    def test_snapshot_renders_the_tree_once(self):
+        snapshot = get_snapshot()
+
+        self.assertEqual(json.loads(snapshot.body), [{
+            'id': str(self.university.pk),
+            'name': 'North University',
+            'departments': [{'id': str(self.department.pk), 'name': 'Computer Science'}],
+        }])
+        self.assertEqual(gzip.decompress(snapshot.gzipped), snapshot.body)
+        self.assertEqual(json.loads(snapshot.departments_of(self.university.pk))[0]['name'], 'Computer Science')
+        self.assertIsNone(snapshot.departments_of('unknown'))
+        with self.assertNumQueries(0):
+            self.assertIs(get_snapshot(), snapshot)
+
+    def test_catalog_changes_replace_the_snapshot(self):
+        get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            University.objects.create(name='South University')
+
+        self.assertEqual(self.names(get_snapshot()), ['North University', 'South University'])
+
+    def test_missed_bumps_are_bounded_by_the_ttl(self):
+        built = get_snapshot()
+        # no signal, so no version bump
+        University.objects.filter(pk=self.university.pk).update(name='Renamed University')
+        self.assertIs(get_snapshot(), built)
+
+        with mock.patch('university.catalog.time.time', return_value=built.built_at + 601):
+            self.assertEqual(self.names(get_snapshot()), ['Renamed University'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CatalogResponseTests(CatalogTestCase):
+    url = '/api/institutions/universities/'
+
+    def test_gzip_is_a_separate_representation(self):
+        plain = self.client.get(self.url)
+        zipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+
+        self.assertEqual(json.loads(plain.content)[0]['name'], 'North University')
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertNotEqual(plain['ETag'], zipped['ETag'])
+        self.assertEqual(plain['ETag'], refused['ETag'])
+        self.assertIn('Accept-Encoding', zipped['Vary'])
+
+    def test_not_modified_per_encoding(self):
+        zipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+
+        again = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=zipped['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertIn('Accept-Encoding', again['Vary'])
+        # the gzip ETag does not validate the identity body
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=zipped['ETag']).status_code, 200)
+
+    def test_departments_of_a_university(self):
+        response = self.client.get(f'/api/institutions/universities/{self.university.pk}/departments/')
+
+        self.assertEqual(response.json(), [{'id': str(self.department.pk), 'name': 'Computer Science'}])
+        missing = self.client.get('/api/institutions/universities/00000000-0000-0000-0000-000000000000/departments/')
+        self.assertEqual(missing.status_code, 404)
+
+
+class CatalogLoaderTests(CatalogTestCase):
+    def departments_of(self, name):
+        return sorted(University.objects.get(name=name).departments.values_list('name', flat=True))
+
+    def test_departments_are_shared_across_universities(self):
+        created = load_catalog({
+            'North University': ['computer science', 'Physics'],
+            'South University': ['PHYSICS', '  Physics  ', 'Mathematics'],
+        })
+
+        self.assertEqual(created, {'universities': 1, 'departments': 2, 'links': 3})
+        # the existing row is reused whatever the case
+        self.assertEqual(Department.objects.filter(name__iexact='computer science').count(), 1)
+        physics = Department.objects.get(name__iexact='physics')
+        self.assertEqual(sorted(physics.universities.values_list('name', flat=True)), ['North University', 'South University'])
+        self.assertEqual(self.departments_of('South University'), ['Mathematics', 'Physics'])
+
+    def test_loading_again_changes_nothing(self):
+        catalog = {'South University': ['Physics', 'Mathematics']}
+        load_catalog(catalog)
+
+        self.assertEqual(load_catalog(catalog), {'universities': 0, 'departments': 0, 'links': 0})
+        self.assertEqual(Department.objects.count(), 3)
+
+    def test_query_count_does_not_grow_with_the_catalog(self):
+        def queries(catalog):
+            with CaptureQueriesContext(connection) as captured:
+                load_catalog(catalog)
+            return len(captured)
+
+        small = queries({f'Small {n}': ['Physics'] for n in range(2)})
+        large = queries({f'Large {n}': [f'Department {m}' for m in range(n)] for n in range(20)})
+        self.assertEqual(small, large)
+
+    def test_loaded_catalog_replaces_the_snapshot(self):
+        get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            load_catalog({'South University': ['Physics']})
+
+        self.assertEqual(self.names(get_snapshot()), ['North University', 'South University'])
+
+    def test_parsing(self):
+        csv_catalog = parse_catalog(b'university,department\nNorth University,Physics\nNorth University,Chemistry\n,Orphan\n')
+        self.assertEqual(csv_catalog, {'North University': ['Physics', 'Chemistry']})
+        self.assertEqual(
+            parse_catalog('{"universities": [{"name": "South University", "departments": ["Physics"]}]}'),
+            {'South University': ['Physics']},
+        )
+        for bad in ('name,department\nNorth,Physics\n', '[{"departments": []}]', '[{"name": "X", "departments": "Physics"}]'):
+            with self.subTest(catalog=bad), self.assertRaises(CatalogError):
+                parse_catalog(bad)
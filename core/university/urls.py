@@ -1,10 +1,11 @@
 
 from django.urls import path
-from .views import UniversityListView, DepartmentListView, UniversityDepartmentsView
+from .views import UniversityListView, DepartmentListView, UniversityDepartmentsView, CatalogLoadView
 urlpatterns = [     
 
     path('universities/', UniversityListView.as_view(), name='university-list'),
     path('departments/', DepartmentListView.as_view(), name='department-list'),
     path('universities/<str:university_id>/departments/', UniversityDepartmentsView.as_view(), name='university-departments'),
+    path('catalog/load/', CatalogLoadView.as_view(), name='catalog-load'),
 
     ]
\ No newline at end of file
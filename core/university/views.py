@@ -4,20 +4,66 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from .models import University,Department
 from .serializers import UniversitySerializer,DepartmentSerializer
+from core.query_planning import apply_query_plan
+from core.conditional import ConditionalGetMixin, accepts_encoding, make_etag, version_to_datetime
+from core.response_cache import current_versions
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from .catalog import get_snapshot
+from .loader import CatalogError, catalog_from_data, load_catalog, name_key, parse_catalog
 # Create your views here.
 
 
+def snapshot_response(request, body, gzipped=None):
+    """
+    Serve pre-rendered catalog JSON, pre-gzipped when the client accepts it.
+    """
+    if gzipped is not None and accepts_encoding(request, 'gzip'):
+        response = HttpResponse(gzipped, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    return response
+
+
+class CatalogValidatorsMixin(ConditionalGetMixin):
+    """
+    Validators from the catalog snapshot: its content hash and version stamp.
+    The gzipped body is a different representation, so it gets its own ETag.
+    """
+    def serves_gzip(self, request, *args, **kwargs):
+        return False
 
-class UniversityListView(APIView):
+    def get_validators(self, request, *args, **kwargs):
+        self.snapshot = get_snapshot()
+        stamp = current_versions(('catalog',))[0]
+        etag = make_etag(request.path, self.snapshot.version)
+        if self.serves_gzip(request, *args, **kwargs) and accepts_encoding(request, 'gzip'):
+            etag = etag[:-1] + '-gzip"'
+        return etag, version_to_datetime(stamp)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # 304s too: caches must not answer a gzip request with the identity ETag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+
+class UniversityListView(CatalogValidatorsMixin, APIView):
     """
     API endpoint to list all universities.
+    The list comes from the precomputed catalog snapshot.
     """
     permission_classes = [permissions.AllowAny]
 
+    def serves_gzip(self, request, *args, **kwargs):
+        return not kwargs.get('id')
+
     def get(self, request, id=None):
         if id:
             try:
-                university = University.objects.get(id=id)
+                university = apply_query_plan(University.objects.all(), UniversitySerializer).get(id=id)
                 serializer = UniversitySerializer(university)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             except University.DoesNotExist:
@@ -25,9 +71,8 @@ class UniversityListView(APIView):
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         try:
-            universities = University.objects.all()
-            serializer = UniversitySerializer(universities, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            snapshot = getattr(self, 'snapshot', None) or get_snapshot()
+            return snapshot_response(request, snapshot.body, snapshot.gzipped)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     def post(self, request):
@@ -71,30 +116,32 @@ class DepartmentListView(APIView):
 
 
 
-class UniversityDepartmentsView(APIView):
+class UniversityDepartmentsView(CatalogValidatorsMixin, APIView):
     """
     API endpoint to get departments of a specific university.
     Create departments for a specific university
+    Reads come from the precomputed catalog snapshot.
     """
     permission_classes = [permissions.AllowAny]
 
 
     def get(self, request, university_id):
-        try:
-            university = University.objects.get(id=university_id)
-            departments = university.departments.all()
-            serializer = DepartmentSerializer(departments, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except University.DoesNotExist:
+        snapshot = getattr(self, 'snapshot', None) or get_snapshot()
+        departments = snapshot.departments_of(university_id)
+        if departments is None:
             return Response({"error": "University not found."}, status=status.HTTP_404_NOT_FOUND)
+        return snapshot_response(request, departments)
 
     def post(self, request, university_id):
         try:
             university = University.objects.get(id=university_id)
             serializer = DepartmentSerializer(data=request.data, many=True)  # ✅ allow multiple departments
             if serializer.is_valid():
-                departments = serializer.save()
-                university.departments.add(*departments)  # ✅ attach them to university
+                # shared department rows per name, created/linked in bulk by the catalog loader
+                names = [item.get('name') for item in serializer.validated_data]
+                load_catalog({university.name: names})
+                keys = {name_key(name) for name in names}
+                departments = [d for d in university.departments.all() if name_key(d.name) in keys]
                 return Response(
                     DepartmentSerializer(departments, many=True).data,
                     status=status.HTTP_201_CREATED
@@ -105,3 +152,24 @@ class UniversityDepartmentsView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class CatalogLoadView(APIView):
+    """
+    Admin endpoint to seed universities and departments in bulk.
+    Accepts a JSON/CSV catalog upload (`catalog`) or a JSON body, see
+    university/loader.py for the format. Re-posting a catalog is a no-op.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get('catalog')
+        try:
+            if upload is not None:
+                fmt = 'csv' if upload.name.lower().endswith('.csv') else None
+                catalog = parse_catalog(upload.read(), fmt)
+            else:
+                catalog = catalog_from_data(request.data)
+            created = load_catalog(catalog)
+        except CatalogError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Catalog loaded", "data": created}, status=status.HTTP_200_OK)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UserStatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_stats'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from user_stats.stats import compute_user_stats, store_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized stats of every creator in batches. Run periodically to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        batch_size = options['batch_size']
+        creators = User.objects.filter(contributions__isnull=False).distinct().order_by('pk')
+
+        reconciled = 0
+        last_pk = None
+        while True:
+            queryset = creators if last_pk is None else creators.filter(pk__gt=last_pk)
+            user_ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            store_user_stats(compute_user_stats(user_ids))
+            reconciled += len(user_ids)
+            last_pk = user_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled stats of {reconciled} creators."))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from enrollment.view_counters import view_counter_buffer
+from user_stats.rollups import prune_views, roll_up_views
+
+
+class Command(BaseCommand):
+    help = "Fold new video view events into the hourly/daily rollups. Run from cron every few minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help="Event ids per transaction.")
+        parser.add_argument('--prune', action='store_true', help="Also apply the retention policy afterwards.")
+        parser.add_argument('--event-days', type=int, default=None, help="Override VIEW_EVENT_RETENTION_DAYS.")
+        parser.add_argument('--hourly-days', type=int, default=None, help="Override VIEW_HOURLY_ROLLUP_RETENTION_DAYS.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # write out what this process still buffers before rolling up
+        view_counter_buffer.flush()
+        rolled = roll_up_views(batch_size=options['batch_size'])
+        message = f"Rolled up {rolled} view events in {time.monotonic() - started:.1f}s."
+        if options['prune']:
+            events, hourly = prune_views(options['event_days'], options['hourly_days'], batch_size=options['batch_size'])
+            message += f" Pruned {events} raw events and {hourly} hourly rollups."
+        self.stdout.write(self.style.SUCCESS(message))
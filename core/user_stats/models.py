@@ -1,3 +1,66 @@
 from django.db import models
+from django.conf import settings
 
 # Create your models here.
+
+
+class UserStats(models.Model):
+    """
+    Denormalized lifetime stats of a creator, kept up to date incrementally
+    (see user_stats.stats) and repaired by the reconcile_user_stats command.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_views = models.BigIntegerField(default=0)
+    total_contributions = models.IntegerField(default=0)
+    total_contribution_comments = models.IntegerField(default=0)
+    total_contribution_ratings = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "User stats"
+
+    def __str__(self):
+        return f"Stats of user {self.user_id}"
+
+
+class VideoViewRollup(models.Model):
+    """
+    Plays of one video in one UTC hour or day, aggregated from the view event
+    log by user_stats.rollups. The contribution and its creator are copied in
+    so creator analytics are a range scan on this table alone.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    video = models.ForeignKey('contributions.ContributionVideos', on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, db_index=False)
+    contribution = models.ForeignKey('contributions.Contributions', on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, db_index=False)
+    creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    views = models.BigIntegerField(default=0)
+    new_viewers = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'video'], name='view_rollup_bucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['creator', 'period', 'bucket'], name='view_rollup_creator_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.views} views of {self.video_id} ({self.period} {self.bucket})"
+
+
+class RollupCheckpoint(models.Model):
+    """
+    Last view event id folded into the rollups.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
@@ -0,0 +1,221 @@
+"""
+Hourly and daily video view rollups for creator analytics.
+
+Every play lands in enrollment.VideoViewEvent, an append-only log.
+roll_up_views() folds the events past a checkpoint (by id) into one
+VideoViewRollup row per video and UTC hour / day, adding to rows that
+already exist so late events still land in their bucket. Rows carry the
+contribution and its creator, so creator_view_series() reads a few rollup
+rows per bucket and never touches raw events.
+
+The checkpoint only moves up to the newest event inserted (logged_at, not
+viewed_at, which can be minutes older for buffered plays) more than
+COMMIT_LAG ago. Ids are taken at insert time, so every lower id belongs to
+an insert at least that old, whose transaction has committed by then.
+
+prune_views() deletes raw events once they are rolled up and older than
+VIEW_EVENT_RETENTION_DAYS, and hourly rollups older than
+VIEW_HOURLY_ROLLUP_RETENTION_DAYS; daily rollups are kept. Both go in
+primary key batches, which keeps the event table small enough that it
+needs neither secondary indexes nor partitioning.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import RollupCheckpoint, VideoViewRollup
+
+CHECKPOINT = 'video_views'
+# inserts are stamped before their transaction commits; only trust ids older than this
+COMMIT_LAG = timedelta(seconds=60)
+PERIOD_STEPS = {VideoViewRollup.HOUR: timedelta(hours=1), VideoViewRollup.DAY: timedelta(days=1)}
+
+
+def bucket_start(moment, period):
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if period == VideoViewRollup.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def aggregate_events(low, high):
+    """
+    {(period, bucket, video_id): {contribution_id, views, new_viewers}} of the events low < id <= high.
+    """
+    from enrollment.models import VideoViewEvent
+
+    rows = (
+        VideoViewEvent.objects.filter(id__gt=low, id__lte=high).order_by()
+        .annotate(hour=TruncHour('viewed_at', tzinfo=dt_timezone.utc))
+        .values('hour', 'video_id', 'contribution_id')
+        .annotate(views=Count('id'), new_viewers=Count('id', filter=Q(first_view=True)))
+    )
+    totals = {}
+    for row in rows:
+        for period in PERIOD_STEPS:
+            key = (period, bucket_start(row['hour'], period), row['video_id'])
+            total = totals.setdefault(key, {'contribution_id': row['contribution_id'], 'views': 0, 'new_viewers': 0})
+            total['views'] += row['views']
+            total['new_viewers'] += row['new_viewers']
+    return totals
+
+
+def merge_rollups(totals):
+    """
+    Add aggregated counts to the rollup rows, creating missing ones. Returns the number of events merged.
+    """
+    from contributions.models import Contributions
+
+    if not totals:
+        return 0
+    creators = dict(
+        Contributions.objects.filter(pk__in={total['contribution_id'] for total in totals.values()})
+        .values_list('pk', 'user_id')
+    )
+    existing = {
+        (period, bucket, video_id): (views, new_viewers)
+        for period, bucket, video_id, views, new_viewers in VideoViewRollup.objects.filter(
+            period__in={key[0] for key in totals},
+            bucket__in={key[1] for key in totals},
+            video_id__in={key[2] for key in totals},
+        ).values_list('period', 'bucket', 'video_id', 'views', 'new_viewers')
+    }
+    rows = []
+    merged = 0
+    for (period, bucket, video_id), total in totals.items():
+        creator_id = creators.get(total['contribution_id'])
+        if creator_id is None:
+            # the contribution is gone
+            continue
+        views, new_viewers = existing.get((period, bucket, video_id), (0, 0))
+        rows.append(VideoViewRollup(
+            period=period,
+            bucket=bucket,
+            video_id=video_id,
+            contribution_id=total['contribution_id'],
+            creator_id=creator_id,
+            views=views + total['views'],
+            new_viewers=new_viewers + total['new_viewers'],
+        ))
+        if period == VideoViewRollup.HOUR:
+            merged += total['views']
+    VideoViewRollup.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['period', 'bucket', 'video'],
+        update_fields=['views', 'new_viewers'],
+    )
+    return merged
+
+
+def roll_up_views(batch_size=10000):
+    """
+    Fold new view events into the rollups, batch_size event ids per transaction. Returns the number of events rolled up.
+    """
+    from enrollment.models import VideoViewEvent
+
+    bound = (
+        VideoViewEvent.objects.filter(logged_at__lte=timezone.now() - COMMIT_LAG)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    rolled = 0
+    while bound is not None:
+        with transaction.atomic():
+            # the row lock also keeps concurrent runs from merging the same events twice
+            checkpoint, _created = RollupCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT)
+            if checkpoint.position >= bound:
+                break
+            high = min(bound, checkpoint.position + batch_size)
+            rolled += merge_rollups(aggregate_events(checkpoint.position, high))
+            checkpoint.position = high
+            checkpoint.save(update_fields=['position', 'updated_at'])
+    return rolled
+
+
+def prune_views(event_days=None, hourly_days=None, batch_size=10000):
+    """
+    Apply the retention policy; returns (events deleted, hourly rollups deleted).
+    """
+    from enrollment.models import VideoViewEvent
+
+    if event_days is None:
+        event_days = getattr(settings, 'VIEW_EVENT_RETENTION_DAYS', 7)
+    if hourly_days is None:
+        hourly_days = getattr(settings, 'VIEW_HOURLY_ROLLUP_RETENTION_DAYS', 90)
+    now = timezone.now()
+    rolled_up = RollupCheckpoint.objects.filter(name=CHECKPOINT).values_list('position', flat=True).first() or 0
+
+    targets = (
+        # never drop events that have not been rolled up yet
+        VideoViewEvent.objects.filter(id__lte=rolled_up, viewed_at__lt=now - timedelta(days=event_days)),
+        VideoViewRollup.objects.filter(period=VideoViewRollup.HOUR, bucket__lt=now - timedelta(days=hourly_days)),
+    )
+    deleted = []
+    for queryset in targets:
+        count = 0
+        while True:
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            count += queryset.model.objects.filter(pk__in=pks).delete()[0]
+        deleted.append(count)
+    return tuple(deleted)
+
+
+def creator_view_series(creator_id, period, buckets, contribution_id=None):
+    """
+    Views of a creator's videos over the last `buckets` hours or days (the current one included),
+    one point per bucket, plus the totals per contribution.
+    """
+    from contributions.models import Contributions
+
+    step = PERIOD_STEPS[period]
+    end = bucket_start(timezone.now(), period)
+    start = end - step * (buckets - 1)
+
+    rows = VideoViewRollup.objects.filter(creator_id=creator_id, period=period, bucket__gte=start).order_by()
+    if contribution_id is not None:
+        rows = rows.filter(contribution_id=contribution_id)
+    points = {
+        row['bucket']: row
+        for row in rows.values('bucket').annotate(views=Sum('views'), new_viewers=Sum('new_viewers'))
+    }
+    per_contribution = list(
+        rows.values('contribution_id').annotate(views=Sum('views'), new_viewers=Sum('new_viewers'))
+        .order_by('-views', 'contribution_id')
+    )
+    titles = dict(
+        Contributions.objects.filter(pk__in=[row['contribution_id'] for row in per_contribution])
+        .values_list('pk', 'title')
+    )
+
+    series = []
+    for n in range(buckets):
+        bucket = start + step * n
+        point = points.get(bucket, {})
+        series.append({
+            'bucket': bucket,
+            'views': point.get('views') or 0,
+            'new_viewers': point.get('new_viewers') or 0,
+        })
+    return {
+        'period': period,
+        'start': start,
+        'total_views': sum(point['views'] for point in series),
+        'total_new_viewers': sum(point['new_viewers'] for point in series),
+        'series': series,
+        'contributions': [
+            {
+                'id': row['contribution_id'],
+                'title': titles.get(row['contribution_id']),
+                'views': row['views'],
+                'new_viewers': row['new_viewers'],
+            }
+            for row in per_contribution
+        ],
+    }
@@ -0,0 +1,75 @@
+"""
+Keep UserStats in step with contributions, comments and ratings.
+View counts arrive through the view counter flush (enrollment.view_counters).
+"""
+
+import threading
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from contributions.models import Contributions, ContributionsComments, ContributionRatings
+from .stats import bump_user_stats
+
+# contributions being deleted in this thread; their cascaded comments and
+# ratings are settled in one step by contribution_deleted()
+_deleting = threading.local()
+
+
+def _deleting_ids():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def _owner_id(contribution_id):
+    return Contributions.objects.filter(pk=contribution_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Contributions)
+def contribution_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_user_stats(instance.user_id, total_contributions=1)
+
+
+@receiver(pre_delete, sender=Contributions)
+def contribution_deleting(sender, instance, **kwargs):
+    _deleting_ids().add(instance.pk)
+    instance._stats_comments = instance.comments.count()
+    instance._stats_ratings = instance.contribution_ratings.count()
+
+
+@receiver(post_delete, sender=Contributions)
+def contribution_deleted(sender, instance, **kwargs):
+    _deleting_ids().discard(instance.pk)
+    bump_user_stats(
+        instance.user_id,
+        total_contributions=-1,
+        total_views=-instance.total_views,
+        total_contribution_comments=-getattr(instance, '_stats_comments', 0),
+        total_contribution_ratings=-getattr(instance, '_stats_ratings', 0),
+    )
+
+
+@receiver(post_save, sender=ContributionsComments)
+def comment_saved(sender, instance, created, **kwargs):
+    if created and instance.contribution_id:
+        bump_user_stats(_owner_id(instance.contribution_id), total_contribution_comments=1)
+
+
+@receiver(post_delete, sender=ContributionsComments)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.contribution_id and instance.contribution_id not in _deleting_ids():
+        bump_user_stats(_owner_id(instance.contribution_id), total_contribution_comments=-1)
+
+
+@receiver(post_save, sender=ContributionRatings)
+def rating_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_user_stats(_owner_id(instance.contribution_id), total_contribution_ratings=1)
+
+
+@receiver(post_delete, sender=ContributionRatings)
+def rating_deleted(sender, instance, **kwargs):
+    if instance.contribution_id not in _deleting_ids():
+        bump_user_stats(_owner_id(instance.contribution_id), total_contribution_ratings=-1)
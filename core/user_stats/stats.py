@@ -0,0 +1,109 @@
+"""
+Incremental maintenance of UserStats.
+
+Every change is applied as an atomic `field = field + delta` UPDATE on the
+creator's row. When the row does not exist yet it is computed from scratch,
+which already includes the change being recorded.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import UserStats
+
+STAT_FIELDS = ['total_views', 'total_contributions', 'total_contribution_comments', 'total_contribution_ratings']
+
+
+def compute_user_stats(user_ids):
+    """
+    Stats of the given users straight from the source tables, four grouped queries per batch.
+    """
+    from contributions.models import Contributions, ContributionsComments, ContributionRatings
+
+    stats = {user_id: dict.fromkeys(STAT_FIELDS, 0) for user_id in user_ids}
+    contributions = (
+        Contributions.objects.filter(user_id__in=user_ids).order_by().values('user_id')
+        .annotate(views=Sum('total_views'), count=Count('id'))
+    )
+    for row in contributions:
+        stats[row['user_id']]['total_views'] = row['views'] or 0
+        stats[row['user_id']]['total_contributions'] = row['count']
+
+    for model, field in ((ContributionsComments, 'total_contribution_comments'), (ContributionRatings, 'total_contribution_ratings')):
+        rows = (
+            model.objects.filter(contribution__user_id__in=user_ids).order_by()
+            .values('contribution__user_id').annotate(count=Count('id'))
+        )
+        for row in rows:
+            stats[row['contribution__user_id']][field] = row['count']
+    return stats
+
+
+def store_user_stats(stats):
+    """
+    Upsert absolute stats ({user_id: {field: value}}) in one statement.
+    """
+    now = timezone.now()
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id, reconciled_at=now, **values) for user_id, values in stats.items()],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*STAT_FIELDS, 'reconciled_at', 'updated_at'],
+    )
+
+
+def get_user_stats(user_id):
+    """
+    The stats row as a dict; built on first use.
+    """
+    row = UserStats.objects.filter(pk=user_id).values(*STAT_FIELDS).first()
+    if row is None:
+        row = compute_user_stats([user_id])[user_id]
+        store_user_stats({user_id: row})
+    return row
+
+
+def bump_user_stats(user_id, **deltas):
+    if user_id is None:
+        return
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = UserStats.objects.filter(pk=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()},
+        updated_at=timezone.now(),
+    )
+    # a missing row is built on first read anyway; only build it eagerly on growth,
+    # never from a delete (the user itself may be cascading away)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        store_user_stats(compute_user_stats([user_id]))
+
+
+def add_contribution_views(contribution_deltas):
+    """
+    Carry flushed view increments ({contribution_id: views}) over to the creators, one UPDATE per distinct delta.
+    """
+    from contributions.models import Contributions
+
+    owners = {
+        str(pk): user_id
+        for pk, user_id in Contributions.objects.filter(pk__in=list(contribution_deltas)).values_list('pk', 'user_id')
+    }
+    user_deltas = defaultdict(int)
+    for contribution_id, views in contribution_deltas.items():
+        user_id = owners.get(str(contribution_id))
+        if user_id is not None:
+            user_deltas[user_id] += views
+
+    by_delta = defaultdict(list)
+    for user_id, views in user_deltas.items():
+        by_delta[views].append(user_id)
+    for views, user_ids in by_delta.items():
+        updated = UserStats.objects.filter(pk__in=user_ids).update(total_views=F('total_views') + views, updated_at=timezone.now())
+        if updated < len(user_ids):
+            existing = set(UserStats.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+            missing = [user_id for user_id in user_ids if user_id not in existing]
+            store_user_stats(compute_user_stats(missing))
+
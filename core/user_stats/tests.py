@@ -1,3 +1,86 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from contributions.models import Contributions, ContributionVideos
+from enrollment.models import VideoViewEvent
+from .models import VideoViewRollup
+from .rollups import bucket_start, creator_view_series, prune_views, roll_up_views
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create(username='creator', email='creator@example.com')
+        self.viewer = User.objects.create(username='viewer', email='viewer@example.com')
+        self.contribution = Contributions.objects.create(title='Compilers', active=True, user=self.creator)
+        self.video = ContributionVideos.objects.create(contribution=self.contribution, title='Parsing')
+        self.now = timezone.now()
+
+    def log_views(self, viewed_at, count, first_view=False, logged_ago=timedelta(minutes=5)):
+        VideoViewEvent.objects.bulk_create([
+            VideoViewEvent(video=self.video, contribution=self.contribution, user=self.viewer,
+                           first_view=first_view, viewed_at=viewed_at)
+            for _ in range(count)
+        ])
+        # older than the commit lag, so the rollup trusts them
+        VideoViewEvent.objects.filter(logged_at__gt=self.now - logged_ago).update(logged_at=self.now - logged_ago)
+
+    def rollup(self, period, moment):
+        return VideoViewRollup.objects.values_list('views', 'new_viewers').get(
+            period=period, bucket=bucket_start(moment, period), video=self.video,
+        )
+
+    def test_events_land_in_their_hour_and_day(self):
+        earlier = self.now - timedelta(hours=3)
+        self.log_views(earlier, 2, first_view=True)
+        self.log_views(self.now, 3)
+
+        self.assertEqual(roll_up_views(), 5)
+        self.assertEqual(self.rollup(VideoViewRollup.HOUR, earlier), (2, 2))
+        self.assertEqual(self.rollup(VideoViewRollup.HOUR, self.now), (3, 0))
+        if bucket_start(earlier, VideoViewRollup.DAY) == bucket_start(self.now, VideoViewRollup.DAY):
+            self.assertEqual(self.rollup(VideoViewRollup.DAY, self.now), (5, 2))
+
+    def test_late_events_are_added_to_existing_buckets(self):
+        self.log_views(self.now, 1)
+        roll_up_views()
+        self.log_views(self.now, 2)
+
+        self.assertEqual(roll_up_views(), 2)
+        self.assertEqual(roll_up_views(), 0)
+        self.assertEqual(self.rollup(VideoViewRollup.HOUR, self.now), (3, 0))
+
+    def test_recent_inserts_wait_for_the_commit_lag(self):
+        self.log_views(self.now, 1)
+        VideoViewEvent.objects.create(
+            video=self.video, contribution=self.contribution, user=self.viewer, viewed_at=self.now,
+        )
+
+        self.assertEqual(roll_up_views(), 1)
+        VideoViewEvent.objects.update(logged_at=self.now - timedelta(minutes=5))
+        self.assertEqual(roll_up_views(), 1)
+
+    def test_creator_series(self):
+        self.log_views(self.now - timedelta(hours=1), 2, first_view=True)
+        self.log_views(self.now, 1)
+        roll_up_views()
+
+        series = creator_view_series(self.creator.pk, VideoViewRollup.HOUR, 24)
+        self.assertEqual(len(series['series']), 24)
+        self.assertEqual((series['total_views'], series['total_new_viewers']), (3, 2))
+        self.assertEqual([point['views'] for point in series['series'][-2:]], [2, 1])
+        self.assertEqual(series['contributions'], [
+            {'id': self.contribution.pk, 'title': 'Compilers', 'views': 3, 'new_viewers': 2},
+        ])
+
+    def test_prune_keeps_events_that_are_not_rolled_up(self):
+        old = self.now - timedelta(days=30)
+        self.log_views(old, 2)
+        roll_up_views()
+        self.log_views(old, 1)
 
-# Create your tests here.
+        self.assertEqual(prune_views(event_days=7, hourly_days=7), (2, 1))
+        self.assertEqual(VideoViewEvent.objects.count(), 1)
+        self.assertTrue(VideoViewRollup.objects.filter(period=VideoViewRollup.DAY).exists())
@@ -1,8 +1,9 @@
 
 from django.urls import path
-from .views import UserStatsView
+from .views import UserStatsView, CreatorViewsAnalyticsView
 urlpatterns = [    
     path('', UserStatsView.as_view(), name='user_stats'), 
+    path('views/', CreatorViewsAnalyticsView.as_view(), name='creator_view_analytics'),
 
     
     ]
\ No newline at end of file
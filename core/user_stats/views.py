@@ -2,8 +2,12 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from contributions.models import Contributions, ContributionsComments, ContributionRatings
-from django.db.models import Sum, Count
+from uuid import UUID
+
+from accounts.authentication import ClaimsJWTAuthentication
+from .models import VideoViewRollup
+from .rollups import creator_view_series
+from .stats import get_user_stats
 
 # Create your views here.
 
@@ -13,22 +17,38 @@ from django.db.models import Sum, Count
 class UserStatsView(APIView):
     def get(self, request):
         user = request.user
-        
-        # Total views across all contributions
-        total_views = Contributions.objects.filter(user=user).aggregate(total_views=Sum('total_views'))['total_views'] or 0
-        
-        # Total number of contributions
-        total_contributions = Contributions.objects.filter(user=user).count()
-        
-        # Total comments on user's contributions
-        total_contribution_comments = ContributionsComments.objects.filter(contribution__user=user).count()
-        
-        # Total ratings on user's contributions
-        total_contribution_ratings = ContributionRatings.objects.filter(contribution__user=user).count()
-        
+
+        # single primary key lookup on the materialized stats row
+        stats = get_user_stats(user.pk)
+
         return Response({
-            'total_views': total_views,
-            'total_contributions': total_contributions,
-            'total_contribution_comments': total_contribution_comments,
-            'total_contribution_ratings': total_contribution_ratings
-        })
\ No newline at end of file
+            'total_views': stats['total_views'],
+            'total_contributions': stats['total_contributions'],
+            'total_contribution_comments': stats['total_contribution_comments'],
+            'total_contribution_ratings': stats['total_contribution_ratings']
+        })
+
+
+class CreatorViewsAnalyticsView(APIView):
+    """
+    Views of the creator's videos per hour or day ("views this week"), read from the rollups only.
+    Query params: period=hour|day (default day), days (default 7), contribution=<uuid>.
+    """
+    authentication_classes = [ClaimsJWTAuthentication]
+    MAX_DAYS = {VideoViewRollup.HOUR: 31, VideoViewRollup.DAY: 366}
+
+    def get(self, request):
+        period = request.query_params.get('period', VideoViewRollup.DAY)
+        if period not in self.MAX_DAYS:
+            return Response({"error": "period must be 'hour' or 'day'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = int(request.query_params.get('days', 7))
+            contribution_id = request.query_params.get('contribution')
+            contribution_id = UUID(contribution_id) if contribution_id else None
+        except ValueError:
+            return Response({"error": "days must be a number and contribution a contribution id."}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, self.MAX_DAYS[period]))
+
+        buckets = days * 24 if period == VideoViewRollup.HOUR else days
+        data = creator_view_series(request.user.pk, period, buckets, contribution_id)
+        return Response({"message": "View analytics retrieved successfully", "data": data}, status=status.HTTP_200_OK)